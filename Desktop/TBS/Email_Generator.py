@@ -1,8 +1,46 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
+import contextlib
 import os
+import sys
 import threading
+import time
+
+import pandas as pd
+
+import email_engine
+import file_io
+from checkpoint import JobCheckpoint, can_checkpoint, spool_path
+from domain_index import DomainIndex
+from email_verify import VERIFICATION_COLUMN, VERIFICATION_EXPORT, EmailVerifier, verify_frame
+from known_people import KnownPeople
+from parallel import ProcessBackend, default_workers
+from pattern_ranking import PatternRanking
+from pattern_store import CONSENSUS_COLUMNS, PatternStore
+from run_log import configure_logging, counters, logger, summarize
+from run_profile import RunProfile
+from ui_queue import UIEventQueue
+from virtual_preview import VirtualPreview
+
+# Result columns shown in the preview's Client / Domain / Email Format / Email columns
+PATTERN_PREVIEW = ['client', 'domain', 'format', 'Email']
+GENERATE_PREVIEW = ['client', 'URL', 'format', 'predicted_email']
+CANDIDATE_PREVIEW = ['client', 'domain', 'pattern', 'email']
+PREDICT_PREVIEW = ['client', 'Domain', 'Email Format', 'Email generated']
+
+# File dialog choices; the format is picked from the file extension
+INPUT_FILETYPES = [
+    ('Data Files', '*.csv *.csv.gz *.parquet *.feather'),
+    ('CSV Files', '*.csv'),
+    ('All Files', '*.*'),
+]
+OUTPUT_FILETYPES = [
+    ('CSV Files', '*.csv'),
+    ('Gzipped CSV Files', '*.csv.gz'),
+    ('Parquet Files', '*.parquet'),
+    ('Feather Files', '*.feather'),
+    ('All Files', '*.*'),
+]
 
 class TreeBusinessGUI:
     def __init__(self):
@@ -37,10 +75,36 @@ class TreeBusinessGUI:
         self.df = None
         self.df2 = None
         self.df3 = None
+        self.file_path = None
+        self.file_path2 = None
+        self.file_path3 = None
         self.processed_df = None
         self.processed_df2 = None
         self.processed_df3 = None
         self.email_patterns = {}
+        self.domain_index = None
+        self.known_people = None
+        self.pattern_store = PatternStore()
+        self.chunk_size = email_engine.DEFAULT_CHUNK_SIZE
+        self.streaming_mode = tk.BooleanVar(value=False)
+        self.workers = tk.IntVar(value=1)  # Above 1 runs pipelines on a process pool
+        self.worker_count = 1  # Snapshot of self.workers taken when a job starts
+        self.candidates = tk.IntVar(value=1)  # Above 1 generates that many ranked candidates per lead
+        self.top_k = 1  # Snapshot of self.candidates taken when generation starts
+        self.pattern_ranking = None
+        self.verify_emails = tk.BooleanVar(value=False)  # Check generated emails with SMTP RCPT probes
+        self.verify = False  # Snapshot of self.verify_emails taken when a job starts
+        self.resumable_jobs = tk.BooleanVar(value=False)  # Checkpoint generate and predict jobs after each chunk
+        self.cache_inputs = tk.BooleanVar(value=False)  # Keep Feather copies of loaded CSVs in input_cache/
+        self.cprofile_enabled = tk.BooleanVar(value=False)
+        self.load_times = {}  # task -> (seconds, rows) of the last file read
+        self.header_only = {}  # task -> whether its file was loaded for streaming, header only
+        self.profiles = {}  # task -> RunProfile of its last job
+        self.cancel_events = {}  # task -> threading.Event of its running job
+        self.last_profile = None
+
+        # Worker threads post widget updates here; the main loop applies them
+        self.ui = UIEventQueue(self.root)
 
         # Setup GUI
         self.setup_gui()
@@ -170,24 +234,161 @@ class TreeBusinessGUI:
         self.tree.column('format', width=150)
         self.tree.column('email', width=200)
 
-        # Scrollbars
-        y_scrollbar = ttk.Scrollbar(results_frame, orient='vertical', command=self.tree.yview)
+        # Filter and row counts
+        filter_frame = tk.Frame(results_frame, bg='black')
+
+        filter_label = tk.Label(
+            filter_frame,
+            text="Filter:",
+            font=('Arial', 12),
+            fg=self.text_color,
+            bg='black'
+        )
+        filter_label.pack(side='left')
+
+        self.filter_var = tk.StringVar()
+        filter_entry = tk.Entry(filter_frame, textvariable=self.filter_var, font=('Arial', 12), width=30)
+        filter_entry.pack(side='left', padx=10)
+
+        self.counts_label = tk.Label(
+            filter_frame,
+            text="",
+            font=('Arial', 12),
+            fg=self.text_color,
+            bg='black'
+        )
+        self.counts_label.pack(side='right')
+
+        # Scrollbars; the vertical one pages through the whole result, not the tree items
+        y_scrollbar = ttk.Scrollbar(results_frame, orient='vertical')
         x_scrollbar = ttk.Scrollbar(results_frame, orient='horizontal', command=self.tree.xview)
 
-        self.tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
+        self.tree.configure(xscrollcommand=x_scrollbar.set)
+
+        # Only one screen of rows is ever inserted into the tree
+        self.preview = VirtualPreview(self.tree, y_scrollbar, self.counts_label)
+        y_scrollbar.configure(command=self.preview.yview)
+        self.filter_var.trace_add('write', lambda *args: self.preview.filter_later(self.filter_var.get()))
 
         # Grid layout
-        self.tree.grid(row=0, column=0, sticky='nsew')
-        y_scrollbar.grid(row=0, column=1, sticky='ns')
-        x_scrollbar.grid(row=1, column=0, sticky='ew')
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky='ew', pady=(0, 5))
+        self.tree.grid(row=1, column=0, sticky='nsew')
+        y_scrollbar.grid(row=1, column=1, sticky='ns')
+        x_scrollbar.grid(row=2, column=0, sticky='ew')
 
         results_frame.grid_columnconfigure(0, weight=1)
-        results_frame.grid_rowconfigure(0, weight=1)
+        results_frame.grid_rowconfigure(1, weight=1)
 
         # Download Buttons Frame
         download_frame = tk.Frame(main_container, bg='white')
         download_frame.pack(fill='x', pady=10)
 
+        # Streaming mode writes results straight to disk instead of keeping them in memory
+        self.streaming_check = tk.Checkbutton(
+            download_frame,
+            text="Streaming mode (large files)",
+            variable=self.streaming_mode,
+            font=('Arial', 12),
+            bg='white'
+        )
+        self.streaming_check.pack(side='left', padx=20)
+
+        workers_label = tk.Label(
+            download_frame,
+            text="Workers:",
+            font=('Arial', 12),
+            bg='white'
+        )
+        workers_label.pack(side='left')
+
+        self.workers_spinbox = tk.Spinbox(
+            download_frame,
+            from_=1,
+            to=default_workers(),
+            textvariable=self.workers,
+            width=4,
+            font=('Arial', 12)
+        )
+        self.workers_spinbox.pack(side='left', padx=5)
+
+        candidates_label = tk.Label(
+            download_frame,
+            text="Candidates per lead:",
+            font=('Arial', 12),
+            bg='white'
+        )
+        candidates_label.pack(side='left', padx=(10, 0))
+
+        self.candidates_spinbox = tk.Spinbox(
+            download_frame,
+            from_=1,
+            to=10,
+            textvariable=self.candidates,
+            width=4,
+            font=('Arial', 12)
+        )
+        self.candidates_spinbox.pack(side='left', padx=5)
+
+        # Verification opens SMTP connections to every domain; it is slow and off by default
+        self.verify_check = tk.Checkbutton(
+            download_frame,
+            text="Verify emails (SMTP)",
+            variable=self.verify_emails,
+            font=('Arial', 12),
+            bg='white'
+        )
+        self.verify_check.pack(side='left', padx=10)
+
+        # Checkpoints spool in-memory results to disk; only worth it for jobs that may be interrupted
+        self.resumable_check = tk.Checkbutton(
+            download_frame,
+            text="Resumable jobs",
+            variable=self.resumable_jobs,
+            font=('Arial', 12),
+            bg='white'
+        )
+        self.resumable_check.pack(side='left', padx=10)
+
+        # The cache holds a Feather copy of each loaded CSV; it saves reparsing but takes disk space
+        self.cache_check = tk.Checkbutton(
+            download_frame,
+            text="Cache CSV inputs",
+            variable=self.cache_inputs,
+            font=('Arial', 12),
+            bg='white'
+        )
+        self.cache_check.pack(side='left', padx=10)
+
+        # cProfile slows jobs down; only switch it on for a deep dive
+        self.cprofile_check = tk.Checkbutton(
+            download_frame,
+            text="cProfile",
+            variable=self.cprofile_enabled,
+            font=('Arial', 12),
+            bg='white'
+        )
+        self.cprofile_check.pack(side='left', padx=10)
+
+        self.export_profile_button = tk.Button(
+            download_frame,
+            text="Export Profile",
+            command=self.export_profile,
+            font=('Arial', 12),
+            cursor='hand2',
+            relief='flat'
+        )
+        self.export_profile_button.pack(side='left', padx=10)
+
+        self.export_consensus_button = tk.Button(
+            download_frame,
+            text="Export Consensus",
+            command=self.export_consensus,
+            font=('Arial', 12),
+            cursor='hand2',
+            relief='flat'
+        )
+        self.export_consensus_button.pack(side='left', padx=10)
+
         # Download buttons
         self.download_button = tk.Button(
             download_frame,
@@ -234,6 +435,20 @@ class TreeBusinessGUI:
         )
         self.download_button3.pack(side='right', padx=20)
 
+        # Upload buttons turn into cancel buttons while a file loads
+        self.upload_texts = {
+            'analyze': self.upload_button.cget('text'),
+            'generate': self.upload_button2.cget('text'),
+            'predict': self.upload_button3.cget('text'),
+        }
+        # ...and run buttons into cancel buttons while a job runs
+        self.job_buttons = {
+            'analyze': (self.process_button, self.process_button.cget('text'), self.process_file),
+            'generate': (self.process_button2, self.process_button2.cget('text'), self.process_file2),
+            'predict': (self.predict_button, self.predict_button.cget('text'), self.predict_emails),
+        }
+
+        self.ui.start()
         self.run()
 
     def setup_pattern_analysis_section(self, parent_frame):
@@ -428,262 +643,484 @@ class TreeBusinessGUI:
 
     def upload_file3(self):
         file_path = filedialog.askopenfilename(
-            filetypes=[('CSV Files', '*.csv'), ('All Files', '*.*')]
+            filetypes=INPUT_FILETYPES
         )
         if file_path:
-            try:
-                df = pd.read_csv(file_path)
-                required_columns = ['First Name', 'Last Name', 'Email Format', 'Domain']
-
-                if all(col.strip() in [col.strip() for col in df.columns] for col in required_columns):
-                    self.df3 = df
-                    self.file_label3.config(
-                        text=f"Selected: {os.path.basename(file_path)}",
-                        fg=self.success_color
-                    )
-                    self.predict_button.config(state='normal')
-                    self.download_button3.config(state='normal')
-                else:
-                    messagebox.showerror("Error", f"Missing required columns. Required: {', '.join(required_columns)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error reading file: {str(e)}")
-                self.file_label3.config(text="Error in file selection", fg=self.warning_color)
+            self.start_loading('predict', file_path)
+
+    def section(self, task):
+        """Widgets of the section for task.
+
+        Returns (file label, upload button, upload command, buttons that need
+        a loaded file, progress bar, status label).
+        """
+        if task == 'analyze':
+            return (self.file_label, self.upload_button, self.upload_file, [self.process_button],
+                    self.progress_bar1, self.status_label1)
+        if task == 'generate':
+            return (self.file_label2, self.upload_button2, self.upload_file2, [self.process_button2],
+                    self.progress_bar2, self.status_label2)
+        return (self.file_label3, self.upload_button3, self.upload_file3, [self.predict_button, self.download_button3],
+                self.progress_bar3, self.status_label3)
+
+    def start_loading(self, task, file_path, on_loaded=None):
+        """Check the file's header, then load it on a background thread; the upload button cancels.
+
+        on_loaded is called on the main thread once the file is kept.
+        """
+        file_label, upload_button, _, buttons, progress_bar, status_label = self.section(task)
+        try:
+            # Only the header is needed to report missing columns
+            email_engine.input_columns(file_path, email_engine.TASK_COLUMNS[task])
+        except Exception as e:
+            messagebox.showerror("Error", f"Error reading file: {str(e)}")
+            file_label.config(text="Error in file selection", fg=self.warning_color)
+            return
+
+        cancel_event = threading.Event()
+        for button in buttons:
+            button.config(state='disabled')
+        upload_button.config(text="Cancel Loading", command=cancel_event.set)
+        file_label.config(text=f"Loading: {os.path.basename(file_path)}", fg=self.text_color)
+        status_label.config(text="Loading file...", fg=self.text_color)
+        progress_bar.config(value=0)
+
+        # Streaming mode only needs the header now; rows are read while processing
+        nrows = 0 if self.streaming_mode.get() else None
+        cache_dir = file_io.DEFAULT_CACHE_DIR if self.cache_inputs.get() else None
+        threading.Thread(
+            target=self._load_thread,
+            args=(task, file_path, nrows, cache_dir, cancel_event, on_loaded),
+            daemon=True
+        ).start()
+
+    def _load_thread(self, task, file_path, nrows, cache_dir, cancel_event, on_loaded):
+        """Thread for reading an uploaded file"""
+        file_label, upload_button, upload_command, buttons, progress_bar, status_label = self.section(task)
+
+        def on_progress(done, total):
+            fraction = done / total if total else 1
+            self.post_progress(progress_bar, status_label, fraction * 100, f"Loading file... {fraction:.0%}")
+
+        try:
+            started = time.perf_counter()
+            df = email_engine.read_input(
+                file_path, email_engine.TASK_COLUMNS[task], nrows=nrows,
+                on_progress=on_progress, cancel_event=cancel_event, cache_dir=cache_dir
+            )
+            self.ui.post(self.finish_loading, task, file_path, df, time.perf_counter() - started, nrows == 0)
+            if on_loaded is not None:
+                self.ui.post(on_loaded)
+
+        except file_io.LoadCancelled:
+            self.ui.post(status_label.config, text="Loading cancelled", fg=self.warning_color)
+            self.ui.post(self.restore_selection, task)
+        except Exception as e:
+            logger.error(f"Error reading file: {str(e)}")
+            self.ui.post(messagebox.showerror, "Error", f"Error reading file: {str(e)}")
+            self.ui.post(status_label.config, text="Error occurred", fg=self.warning_color)
+            self.ui.post(self.restore_selection, task)
+            self.ui.post(file_label.config, text="Error in file selection", fg=self.warning_color)
+        finally:
+            self.ui.post(upload_button.config, text=self.upload_texts[task], command=upload_command)
+
+    def finish_loading(self, task, file_path, df, seconds, header_only=False):
+        """Keep a loaded file and enable the section's buttons"""
+        file_label, _, _, buttons, progress_bar, status_label = self.section(task)
+        if task == 'analyze':
+            self.df, self.file_path = df, file_path
+        elif task == 'generate':
+            self.df2, self.file_path2 = df, file_path
+        else:
+            self.df3, self.file_path3 = df, file_path
+        self.header_only[task] = header_only
+        # Recorded as the 'read' stage of the next job on this file
+        self.load_times[task] = (seconds, len(df))
+
+        file_label.config(text=f"Selected: {os.path.basename(file_path)}", fg=self.success_color)
+        progress_bar.config(value=100)
+        status_label.config(text=f"Loaded {len(df)} rows" if len(df) else "Ready", fg=self.text_color)
+        for button in buttons:
+            button.config(state='normal')
+
+    def reload_rows(self, task, file_path, job):
+        """Re-read a file that was loaded header only for streaming, then run job.
+
+        Returns False when the loaded rows can be used as they are.
+        """
+        if self.streaming_mode.get() or not self.header_only.get(task):
+            return False
+        self.start_loading(task, file_path, on_loaded=job)
+        return True
+
+    def restore_selection(self, task):
+        """After a failed or cancelled load, go back to the previously loaded file, if any"""
+        file_label, _, _, buttons, progress_bar, _ = self.section(task)
+        df, file_path = {
+            'analyze': (self.df, self.file_path),
+            'generate': (self.df2, self.file_path2),
+            'predict': (self.df3, self.file_path3),
+        }[task]
+        progress_bar.config(value=0)
+        if df is None:
+            file_label.config(text="No file selected", fg=self.warning_color)
+            return
+        file_label.config(text=f"Selected: {os.path.basename(file_path)}", fg=self.success_color)
+        for button in buttons:
+            button.config(state='normal')
 
     def predict_emails(self):
         if self.df3 is None:
             messagebox.showerror("Error", "No prediction data available. Please upload a CSV file first.")
             return
 
-        self.predict_button.config(state='disabled')
+        if self.reload_rows('predict', self.file_path3, self.predict_emails):
+            return
+
+        self.verify = self.verify_emails.get()
+        export_columns = self.verified_columns(email_engine.PREDICT_EXPORT)
+        if self.streaming_mode.get():
+            self.start_streaming(
+                'predict',
+                self.file_path3,
+                export_columns,
+                PREDICT_PREVIEW,
+                'email_predictions.csv',
+                self.progress_bar3,
+                self.status_label3
+            )
+            return
+
+        job_checkpoint = self.prepare_checkpoint(
+            'predict', self.file_path3, spool_path('predict', self.file_path3),
+            self.spool_columns(export_columns, PREDICT_PREVIEW)
+        )
         self.status_label3.config(text="Predicting email addresses...")
         self.progress_bar3.config(value=0)
-        threading.Thread(target=self._predict_thread, daemon=True).start()
+        self.start_thread('predict', self._predict_thread, job_checkpoint)
+
+    def start_thread(self, task, target, *args):
+        """Start a worker thread; Tk variables it needs are read here, on the main thread.
+
+        The task's run button becomes a Cancel button until finish_job.
+        """
+        self.worker_count = self.workers.get()
+        counters.reset()
+
+        profile = RunProfile(task, use_cprofile=self.cprofile_enabled.get())
+        if task in self.load_times:
+            seconds, rows = self.load_times[task]
+            profile.add('read', seconds, rows)
+        self.profiles[task] = profile
+
+        cancel_event = threading.Event()
+        self.cancel_events[task] = cancel_event
+        button, _, _ = self.job_buttons[task]
+        button.config(text="Cancel", command=cancel_event.set, state='normal')
+
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    def finish_job(self, task):
+        """Turn the Cancel button back into the task's run button"""
+        button, text, command = self.job_buttons[task]
+        button.config(text=text, command=command, state='normal')
+
+    def spool_columns(self, export_columns, preview_columns):
+        """Result columns an in-memory job needs to save and preview restored rows"""
+        return list(dict.fromkeys([*export_columns.values(), *preview_columns]))
+
+    def prepare_checkpoint(self, task, input_path, output_path, columns):
+        """Checkpoint for a generate or predict job writing output_path, or None.
+
+        Jobs are only checkpointed while "Resumable jobs" is checked. If an
+        earlier run of the same job left a checkpoint, asks whether to resume
+        it; otherwise the old checkpoint is discarded.
+        """
+        if not self.resumable_jobs.get() or task == 'analyze' or not can_checkpoint(output_path):
+            return None
+        store_version = self.pattern_store.version() if task == 'generate' else None
+        job_checkpoint = JobCheckpoint(task, input_path, output_path, columns, self.chunk_size, store_version)
+        manifest = job_checkpoint.pending()
+        if manifest is not None and not messagebox.askyesno(
+            "Resume",
+            f"An earlier run on {os.path.basename(input_path)} stopped after {manifest['rows_read']} rows "
+            f"(checkpoint of {manifest['updated']}). Resume from there?"
+        ):
+            job_checkpoint.remove()
+        return job_checkpoint
+
+    def show_cancelled(self, status_label, profile, job_checkpoint=None):
+        """Final status for a job stopped with its Cancel button"""
+        text = "Cancelled"
+        if job_checkpoint is not None:
+            text += "; run it again to resume from the last checkpoint"
+        status_label.config(text=self.completion_text(text, profile), fg=self.warning_color)
+
+    def keep_counts(self, profile):
+        """Keep the run counters with the job's profile; the next job to start resets them.
+
+        Called on the worker thread as its job ends, before the final status is posted.
+        """
+        if profile is not None:
+            profile.counts = counters.snapshot()
+
+    def completion_text(self, text, profile=None):
+        """Status text for a finished job, with the run counters and stage timings summarized.
+
+        The counters are the ones kept with profile when it has them, so a
+        later save still reports its own job.
+        """
+        if profile is not None and profile.counts is not None:
+            summary = summarize(profile.counts)
+        else:
+            summary = counters.summary()
+        if summary:
+            logger.info(f"{text} {summary}")
+            text = f"{text} ({summary})"
+        if profile is not None:
+            self.last_profile = profile
+            logger.info(f"{profile.job} stages: {profile.summary()}")
+            text = f"{text} | {profile.summary()}"
+        return text
+
+    def show_completion(self, status_label, text, profile=None):
+        """Final status for a job; posted last so the preview time is included"""
+        status_label.config(text=self.completion_text(text, profile), fg=self.success_color)
+
+    def timed(self, profile, stage, func, df, *args):
+        """Run func(df, *args) as a stage of profile, e.g. a preview update on the main loop"""
+        with profile.stage(stage, len(df)):
+            func(df, *args)
+
+    def export_profile(self):
+        if self.last_profile is None:
+            messagebox.showerror("Error", "No profile to export. Please run a job first.")
+            return
 
-    def show_results(self, df):
-        try:
-            # Clear existing items
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            # Insert new data
-            for _, row in df.iterrows():
-                values = [
-                    row['First Name'],
-                    row['Last Name'],
-                    row['Email Format'],
-                    row['Domain'],
-                    row['Email generated']
-                ]
-                self.tree.insert('', 'end', values=values)
+        file_path = filedialog.asksaveasfilename(
+            defaultextension='.json',
+            filetypes=[('JSON Files', '*.json'), ('All Files', '*.*')],
+            initialfile=f"{self.last_profile.job}_profile.json"
+        )
 
-        except Exception as e:
-            print(f"Error showing results: {str(e)}")
-            messagebox.showerror("Error", f"Error showing results: {str(e)}")
+        if file_path:
+            try:
+                self.last_profile.save(file_path)
+                messagebox.showinfo("Success", "Profile saved successfully!")
+            except Exception as e:
+                logger.error(f"Error saving profile: {str(e)}")
+                messagebox.showerror("Error", f"Error saving file: {str(e)}")
 
-    def upload_file3(self):
-        file_path = filedialog.askopenfilename(
-            filetypes=[('CSV Files', '*.csv'), ('All Files', '*.*')]
+    def export_consensus(self):
+        """Save the pattern store's per-domain consensus table"""
+        consensus = self.pattern_store.load_consensus() if self.pattern_store.exists() else []
+        if not consensus:
+            messagebox.showerror("Error", "No stored patterns. Please process a pattern file first.")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            defaultextension='.csv',
+            filetypes=OUTPUT_FILETYPES,
+            initialfile='pattern_consensus.csv'
         )
+
         if file_path:
             try:
-                df = pd.read_csv(file_path)
-                required_columns = ['First Name', 'Last Name', 'Email Format', 'Domain']
-
-                if all(col.strip() in [col.strip() for col in df.columns] for col in required_columns):
-                    self.df3 = df
-                    self.file_label3.config(
-                        text=f"Selected: {os.path.basename(file_path)}",
-                        fg=self.success_color
-                    )
-                    self.predict_button.config(state='normal')
-                    self.download_button3.config(state='normal')
-                else:
-                    messagebox.showerror("Error", f"Missing required columns. Required: {', '.join(required_columns)}")
+                file_io.write_frame(pd.DataFrame(consensus, columns=CONSENSUS_COLUMNS), file_path)
+                messagebox.showinfo("Success", "Pattern consensus saved successfully!")
             except Exception as e:
-                messagebox.showerror("Error", f"Error reading file: {str(e)}")
-                self.file_label3.config(text="Error in file selection", fg=self.warning_color)
+                logger.error(f"Error saving consensus: {str(e)}")
+                messagebox.showerror("Error", f"Error saving file: {str(e)}")
 
-    def predict_emails(self):
-        if self.df3 is None:
-            messagebox.showerror("Error", "No prediction data available. Please upload a CSV file first.")
-            return
+    def show_results(self, df, columns=PREDICT_PREVIEW):
+        """Replace the preview with df"""
+        try:
+            self.preview.set_frame(df, columns)
 
-        self.predict_button.config(state='disabled')
-        self.status_label3.config(text="Predicting email addresses...")
-        self.progress_bar3.config(value=0)
-        threading.Thread(target=self._predict_thread, daemon=True).start()
+        except Exception as e:
+            logger.error(f"Error showing results: {str(e)}")
+            messagebox.showerror("Error", f"Error showing results: {str(e)}")
 
-    def _predict_thread(self):
+    def append_results(self, df, columns=PREDICT_PREVIEW):
+        """Append result rows below the ones already in the preview"""
         try:
-            total_rows = len(self.df3)
-            for i, _ in enumerate(self.df3.iterrows()):
-                result_df = self.generate_predicted_emails()
-                self.show_results(result_df)
-                self.progress_bar3.config(value=(i + 1) / total_rows * 100)
-                self.root.update()
-            self.status_label3.config(text="Email prediction complete!", fg=self.success_color)
-            self.download_button3.config(state='normal')
+            self.preview.append_frame(df, columns)
 
         except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.status_label3.config(text="Error occurred", fg=self.warning_color)
-        finally:
-            self.predict_button.config(state='normal')
+            logger.error(f"Error showing results: {str(e)}")
+            messagebox.showerror("Error", f"Error showing results: {str(e)}")
 
-    def generate_predicted_emails(self):
+    def _predict_thread(self, job_checkpoint=None):
+        profile = self.profiles['predict']
+        profile.start()
+        try:
+            # Start from an empty preview; each finished chunk appends its own rows
+            self.ui.post(self.preview.clear)
+
+            result_df = self.generate_predicted_emails(
+                on_chunk=self._on_predict_chunk, profile=profile,
+                job_checkpoint=job_checkpoint, cancel_event=self.cancel_events['predict']
+            )
+            if result_df is not None:
+                self.keep_counts(profile)
+                self.ui.post(self.show_completion, self.status_label3, "Email prediction complete!", profile)
+                self.ui.post(self.download_button3.config, state='normal')
+
+        except email_engine.JobCancelled:
+            self.keep_counts(profile)
+            self.ui.post(self.show_cancelled, self.status_label3, profile, job_checkpoint)
+        except Exception as e:
+            self.ui.post(messagebox.showerror, "Error", str(e))
+            self.ui.post(self.status_label3.config, text="Error occurred", fg=self.warning_color)
+        finally:
+            profile.stop()
+            self.ui.post(self.finish_job, 'predict')
+
+    def _on_predict_chunk(self, chunk_df, rows_done, total_rows):
+        """Progress callback for the chunked prediction engine"""
+        self.ui.post(self.timed, self.profiles['predict'], 'preview', self.append_results, chunk_df)
+        self.post_progress(self.progress_bar3, self.status_label3, rows_done / total_rows * 100,
+                           f"Predicted {rows_done} of {total_rows} rows...")
+
+    def post_progress(self, progress_bar, status_label, value, text):
+        """Throttled progress update; only the newest one per frame is drawn"""
+        self.ui.post_latest((progress_bar, 'value'), progress_bar.config, value=value)
+        self.ui.post_latest((status_label, 'text'), status_label.config, text=text)
+
+    def generate_predicted_emails(self, on_chunk=None, profile=None, job_checkpoint=None, cancel_event=None):
+        profile = profile or RunProfile('predict')
         try:
             if self.df3 is None:
                 raise ValueError("No prediction data available")
 
-            df = self.df3.copy()
-            df['client'] = df['First Name'] + ' ' + df['Last Name']
-
-            def predict_email(row):
-                try:
-                    first_name = str(row['First Name']).lower().strip()
-                    last_name = str(row['Last Name']).lower().strip()
-                    format_type = str(row['Email Format'])
-                    domain = str(row['Domain'])
-
-                    if format_type == 'FirstName.LastName':
-                        username = f"{first_name}.{last_name}"
-                    elif format_type == 'FirstLetterLastName':
-                        username = f"{first_name[0]}{last_name}"
-                    elif format_type == 'LastName':
-                        username = last_name
-                    elif format_type == 'FirstName':
-                        username = first_name
-                    else:
-                        username = f"{first_name}{last_name[0]}"
-
-                    email = f"{username}@{domain}"
-                    return email
-
-                except Exception as e:
-                    print(f"Error predicting email for row: {row}, Error: {str(e)}")
-                    return "Error predicting email"
-
-            df['Email generated'] = df.apply(predict_email, axis=1)
+            with profile.stage('predict', len(self.df3)):
+                df = self.run_pipeline('predict', self.df3, on_chunk, job_checkpoint, cancel_event)
             self.processed_df3 = df
             return df
 
+        except email_engine.JobCancelled:
+            raise
         except Exception as e:
-            print(f"Error generating predicted emails: {str(e)}")
-            messagebox.showerror("Error", f"Error generating predicted emails: {str(e)}")
+            logger.error(f"Error generating predicted emails: {str(e)}")
+            self.ui.post(messagebox.showerror, "Error", f"Error generating predicted emails: {str(e)}")
             return None
 
-    def setup_email_predictor_section(self, parent_frame):
-        # Implement the Email Predictor section here
-        upload_frame3 = tk.Frame(parent_frame, bg=self.bg_color)
-        upload_frame3.pack(fill='x', pady=5)
-
-        self.file_label3 = tk.Label(
-            upload_frame3,
-            text="No file selected",
-            font=('Arial', 12),
-            fg=self.warning_color,
-            bg=self.bg_color
-        )
-        self.file_label3.pack(side='left', padx=10)
-
-        self.upload_button3 = tk.Button(
-            upload_frame3,
-            text="Upload Predictor CSV",
-            command=self.upload_file3,
-            font=('Arial', 12, 'bold'),
-            bg=self.accent_color,
-            fg='white',
-            padx=20,
-            pady=5,
-            cursor='hand2',
-            relief='flat'
-        )
-        self.upload_button3.pack(side='right', padx=10)
-
-        self.predict_button = tk.Button(
-            upload_frame3,
-            text="Predict Emails",
-            command=self.predict_emails,
-            state='disabled',
-            font=('Arial', 12, 'bold'),
-            bg=self.black,
-            fg='white',
-            padx=20,
-            pady=5,
-            cursor='hand2',
-            relief='flat'
-        )
-        self.predict_button.pack(side='right', padx=10)
-
     def upload_file(self):
         file_path = filedialog.askopenfilename(
-            filetypes=[('CSV Files', '*.csv'), ('All Files', '*.*')]
+            filetypes=INPUT_FILETYPES
         )
         if file_path:
-            try:
-                df = pd.read_csv(file_path)
-                required_columns = ['Email', 'First Name', 'Last Name']
-
-                if all(col in df.columns for col in required_columns):
-                    self.df = df
-                    self.file_label.config(
-                        text=f"Selected: {os.path.basename(file_path)}",
-                        fg=self.success_color
-                    )
-                    self.process_button.config(state='normal')
-                else:
-                    messagebox.showerror("Error", f"Missing required columns. Required: {', '.join(required_columns)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error reading file: {str(e)}")
-                self.file_label.config(text="Error in file selection", fg=self.warning_color)
+            self.start_loading('analyze', file_path)
 
     def upload_file2(self):
         file_path = filedialog.askopenfilename(
-            filetypes=[('CSV Files', '*.csv'), ('All Files', '*.*')]
+            filetypes=INPUT_FILETYPES
         )
         if file_path:
-            try:
-                df = pd.read_csv(file_path)
-                required_columns = ['First Name', 'Last Name', 'URL']
-
-                if all(col in df.columns for col in required_columns):
-                    self.df2 = df
-                    self.file_label2.config(
-                        text=f"Selected: {os.path.basename(file_path)}",
-                        fg=self.success_color
-                    )
-                    self.process_button2.config(state='normal')
-                else:
-                    messagebox.showerror("Error", f"Missing required columns. Required: {', '.join(required_columns)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error reading file: {str(e)}")
-                self.file_label2.config(text="Error in file selection", fg=self.warning_color)
+            self.start_loading('generate', file_path)
+
+    def load_stored_patterns(self):
+        """Load patterns from the pattern store the first time they are needed"""
+        if not self.email_patterns and self.pattern_store.exists():
+            self.email_patterns = self.pattern_store.load_patterns()
+            self.domain_index = DomainIndex(self.email_patterns, self.pattern_store.load_confidence())
+            self.known_people = KnownPeople(self.pattern_store.load_known())
+            self.pattern_ranking = None
+        return self.email_patterns
+
+    def load_pattern_ranking(self):
+        """Pattern counts of the store, ranked for candidate generation; built the first time they are needed"""
+        if self.pattern_ranking is None:
+            self.pattern_ranking = PatternRanking(self.pattern_store.load_counts())
+        return self.pattern_ranking
+
+    def reload_patterns(self):
+        """Refresh the in-memory patterns, domain index and known people from the pattern store"""
+        self.email_patterns = self.pattern_store.load_patterns()
+        self.domain_index = DomainIndex(self.email_patterns, self.pattern_store.load_confidence())
+        self.known_people = KnownPeople(self.pattern_store.load_known())
+        self.pattern_ranking = None
+        logger.info(f"Stored patterns for {len(self.email_patterns)} domains and {len(self.known_people)} known people")
+
+    def generate_columns(self):
+        """(export columns, preview columns) of generation results: one email per lead, or ranked candidates"""
+        if self.top_k > 1:
+            return self.verified_columns(email_engine.CANDIDATE_EXPORT), CANDIDATE_PREVIEW
+        return self.verified_columns(email_engine.GENERATE_EXPORT), GENERATE_PREVIEW
+
+    def verified_columns(self, export_columns):
+        """export_columns, plus the Verification column when the job verifies emails"""
+        return {**export_columns, **VERIFICATION_EXPORT} if self.verify else export_columns
+
+    def saved_columns(self, df, export_columns):
+        """export_columns, plus the Verification column if the job that made df verified its emails"""
+        if VERIFICATION_COLUMN in df:
+            return {**export_columns, **VERIFICATION_EXPORT}
+        return export_columns
 
     def process_file2(self):
         """Process the prediction file"""
-        if self.df2 is None or not self.email_patterns:
+        if self.df2 is None or not self.load_stored_patterns():
             messagebox.showerror("Error", "Please process pattern file first!")
             return
+        if self.reload_rows('generate', self.file_path2, self.process_file2):
+            return
+
+        self.top_k = self.candidates.get()
+        self.verify = self.verify_emails.get()
+        export_columns, preview_columns = self.generate_columns()
+        if self.streaming_mode.get():
+            self.start_streaming(
+                'generate',
+                self.file_path2,
+                export_columns,
+                preview_columns,
+                'email_candidates.csv' if self.top_k > 1 else 'email_predictions.csv',
+                self.progress_bar2,
+                self.status_label2
+            )
+            return
 
-        self.process_button2.config(state='disabled')
-        threading.Thread(target=self._process_thread2, daemon=True).start()
+        job_checkpoint = self.prepare_checkpoint(
+            'generate', self.file_path2, spool_path('generate', self.file_path2),
+            self.spool_columns(export_columns, preview_columns)
+        )
+        self.status_label2.config(text="Generating email addresses...", fg=self.text_color)
+        self.progress_bar2.config(value=0)
+        self.start_thread('generate', self._process_thread2, job_checkpoint)
 
-    def _process_thread2(self):
+    def _process_thread2(self, job_checkpoint=None):
         """Thread for processing prediction file"""
+        profile = self.profiles['generate']
+        profile.start()
         try:
-            self.status_label.config(text="Generating email addresses...")
+            self.ui.post(self.preview.clear)
 
-            result_df = self.generate_emails()
+            result_df = self.generate_emails(
+                on_chunk=self._on_generate_chunk, profile=profile,
+                job_checkpoint=job_checkpoint, cancel_event=self.cancel_events['generate']
+            )
             if result_df is not None:
-                self.show_results(result_df)
-                self.status_label.config(text="Email generation complete!", fg=self.success_color)
-                self.download_button2.config(state='normal')
+                self.keep_counts(profile)
+                self.ui.post(self.show_completion, self.status_label2, "Email generation complete!", profile)
+                self.ui.post(self.download_button2.config, state='normal')
 
+        except email_engine.JobCancelled:
+            self.keep_counts(profile)
+            self.ui.post(self.show_cancelled, self.status_label2, profile, job_checkpoint)
         except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.status_label.config(text="Error occurred", fg=self.warning_color)
+            self.ui.post(messagebox.showerror, "Error", str(e))
+            self.ui.post(self.status_label2.config, text="Error occurred", fg=self.warning_color)
         finally:
-            self.process_button2.config(state='normal')
+            profile.stop()
+            self.ui.post(self.finish_job, 'generate')
+
+    def _on_generate_chunk(self, chunk_df, rows_done, total_rows):
+        """Progress callback for chunked email generation"""
+        self.ui.post(self.timed, self.profiles['generate'], 'preview', self.append_results, chunk_df,
+                     self.generate_columns()[1])
+        self.post_progress(self.progress_bar2, self.status_label2, rows_done / total_rows * 100,
+                           f"Generated {rows_done} of {total_rows} rows...")
 
     def save_results3(self):
         if not hasattr(self, 'processed_df3') or self.processed_df3 is None:
@@ -692,100 +1129,37 @@ class TreeBusinessGUI:
 
         file_path = filedialog.asksaveasfilename(
             defaultextension='.csv',
-            filetypes=[('CSV Files', '*.csv'), ('All Files', '*.*')],
+            filetypes=OUTPUT_FILETYPES,
             initialfile='email_predictions.csv'
         )
 
         if file_path:
             try:
-                save_df = pd.DataFrame({
-                    'First Name': self.processed_df3['First Name'],
-                    'Last Name': self.processed_df3['Last Name'],
-                    'Email Format': self.processed_df3['Email Format'],
-                    'Domain': self.processed_df3['Domain'],
-                    'Email generated': self.processed_df3['Email generated']
-                })
-                save_df.to_csv(file_path, index=False)
+                export_columns = self.saved_columns(self.processed_df3, email_engine.PREDICT_EXPORT)
+                self.save_frame(self.processed_df3, export_columns, file_path, 'predict', self.status_label3)
                 messagebox.showinfo("Success", "Email predictions saved successfully!")
             except Exception as e:
-                print(f"Error saving predictions: {str(e)}")
+                logger.error(f"Error saving predictions: {str(e)}")
                 messagebox.showerror("Error", f"Error saving file: {str(e)}")
 
-    def generate_emails(self):
+    def generate_emails(self, on_chunk=None, profile=None, job_checkpoint=None, cancel_event=None):
+        profile = profile or RunProfile('generate')
         try:
             if self.df2 is None:
                 raise ValueError("No prediction data available")
-            if not self.email_patterns:
+            if not self.load_stored_patterns():
                 raise ValueError("No email patterns available. Please process pattern file first!")
 
-            df = self.df2.copy()
-            df['client'] = df['First Name'] + ' ' + df['Last Name']
-
-            def clean_domain(url):
-                try:
-                    domain = str(url).lower().strip()
-                    domain = domain.replace('http://', '').replace('https://', '').replace('www.', '')
-                    return domain.split('/')[0]
-                except:
-                    return url
-
-            def generate_email(row):
-                try:
-                    domain = clean_domain(row['URL'])
-                    first_name = str(row['First Name']).lower().strip()
-                    last_name = str(row['Last Name']).lower().strip()
-
-                    # Get pattern for this domain
-                    pattern = self.email_patterns.get(domain)
-                    if not pattern:
-                        for known_domain, known_pattern in self.email_patterns.items():
-                            if known_domain in domain or domain in known_domain:
-                                pattern = known_pattern
-                                break
-
-                    if not pattern:
-                        pattern = 'FirstNameFirstLetterLastName'  # Default pattern
-
-                    # Generate username based on pattern
-                    if pattern == 'LastNameFirstLetterFirstName':  # For djoe case
-                        username = f"d{first_name}"
-                    elif pattern == 'FirstNameFirstLetterLastName':  # For ashleyj, fernandof, lisaa cases
-                        username = f"{first_name}{last_name[0]}"
-                    elif pattern == 'FirstNameLastName':  # For willcom case
-                        username = f"{first_name}{last_name}"
-                    elif pattern == 'FirstLetterLastName':
-                        username = f"{first_name[0]}{last_name}"
-                    elif pattern == 'FirstName.LastName':
-                        username = f"{first_name}.{last_name}"
-                    elif pattern == 'FirstName_LastName':
-                        username = f"{first_name}_{last_name}"
-                    elif pattern == 'LastName':
-                        username = last_name
-                    elif pattern == 'FirstName':
-                        username = first_name
-                    else:
-                        username = f"{first_name}{last_name[0]}"  # Default format
-
-                    email = f"{username}@{domain}"
-                    display_format = f"{pattern}@{domain}"
-                    print(f"Generated {email} using pattern {pattern}")
-                    return email, display_format
-
-                except Exception as e:
-                    print(f"Error generating email for row: {row}, Error: {str(e)}")
-                    return "Error generating email", "error"
-
-            # Generate emails and formats
-            emails_and_formats = [generate_email(row) for _, row in df.iterrows()]
-            df['predicted_email'] = [e[0] for e in emails_and_formats]
-            df['format'] = [e[1] for e in emails_and_formats]
-
+            with profile.stage('generate', len(self.df2)):
+                df = self.run_pipeline('generate', self.df2, on_chunk, job_checkpoint, cancel_event)
             self.processed_df2 = df
             return df
 
+        except email_engine.JobCancelled:
+            raise
         except Exception as e:
-            print(f"Error generating emails: {str(e)}")
-            messagebox.showerror("Error", f"Error generating emails: {str(e)}")
+            logger.error(f"Error generating emails: {str(e)}")
+            self.ui.post(messagebox.showerror, "Error", f"Error generating emails: {str(e)}")
             return None
 
     def save_results(self):
@@ -795,22 +1169,16 @@ class TreeBusinessGUI:
 
         file_path = filedialog.asksaveasfilename(
             defaultextension='.csv',
-            filetypes=[('CSV Files', '*.csv'), ('All Files', '*.*')],
+            filetypes=OUTPUT_FILETYPES,
             initialfile='pattern_analysis_results.csv'
         )
 
         if file_path:
             try:
-                save_df = pd.DataFrame({
-                    'Client': self.processed_df['client'],
-                    'Domain': self.processed_df['domain'],
-                    'Email Format': self.processed_df['format'],  # Now includes domain
-                    'Email': self.processed_df['Email']
-                })
-                save_df.to_csv(file_path, index=False)
+                self.save_frame(self.processed_df, email_engine.PATTERN_EXPORT, file_path, 'analyze', self.status_label1)
                 messagebox.showinfo("Success", "Pattern analysis results saved successfully!")
             except Exception as e:
-                print(f"Error saving results: {str(e)}")
+                logger.error(f"Error saving results: {str(e)}")
                 messagebox.showerror("Error", f"Error saving file: {str(e)}")
 
     def save_results2(self):
@@ -820,157 +1188,281 @@ class TreeBusinessGUI:
 
         file_path = filedialog.asksaveasfilename(
             defaultextension='.csv',
-            filetypes=[('CSV Files', '*.csv'), ('All Files', '*.*')],
+            filetypes=OUTPUT_FILETYPES,
             initialfile='email_predictions.csv'
         )
 
         if file_path:
             try:
-                save_df = pd.DataFrame({
-                    'Client': self.processed_df2['client'],
-                    'Domain': self.processed_df2['URL'],
-                    'Email Format': self.processed_df2['format'],  # Now includes domain
-                    'Predicted Email': self.processed_df2['predicted_email']
-                })
-                save_df.to_csv(file_path, index=False)
+                export_columns = self.saved_columns(
+                    self.processed_df2,
+                    email_engine.CANDIDATE_EXPORT if 'rank' in self.processed_df2 else email_engine.GENERATE_EXPORT
+                )
+                self.save_frame(self.processed_df2, export_columns, file_path, 'generate', self.status_label2)
                 messagebox.showinfo("Success", "Email predictions saved successfully!")
             except Exception as e:
-                print(f"Error saving predictions: {str(e)}")
+                logger.error(f"Error saving predictions: {str(e)}")
                 messagebox.showerror("Error", f"Error saving file: {str(e)}")
 
+    def save_frame(self, df, export_columns, file_path, task, status_label):
+        """Export a result frame in the format of file_path, timed as the 'save' stage of its job"""
+        profile = self.profiles.get(task) or RunProfile(task)
+        with profile.stage('save', len(df)):
+            save_df = email_engine.export_frame(df, export_columns)
+            file_io.write_frame(save_df, file_path)
+        status_label.config(text=self.completion_text("Results saved", profile))
+
     def process_file(self):
         if self.df is None:
             return
-        self.process_button.config(state='disabled')
-        threading.Thread(target=self._process_thread, daemon=True).start()
+        if self.reload_rows('analyze', self.file_path, self.process_file):
+            return
 
+        if self.streaming_mode.get():
+            self.start_streaming(
+                'analyze',
+                self.file_path,
+                email_engine.PATTERN_EXPORT,
+                PATTERN_PREVIEW,
+                'pattern_analysis_results.csv',
+                self.progress_bar1,
+                self.status_label1,
+                on_done=self.reload_patterns
+            )
+            return
 
-    def _process_thread(self):
-        try:
-            self.progress_bar['value'] = 20
-            self.status_label.config(text="Processing patterns...")
+        self.status_label1.config(text="Processing patterns...", fg=self.text_color)
+        self.progress_bar1.config(value=0)
+        self.start_thread('analyze', self._process_thread)
+
+    def pipeline_func(self, task):
+        """In-process engine function for 'analyze', 'generate' or 'predict'"""
+        if task == 'analyze':
+            return email_engine.analyze_frame
+        if task == 'generate' and self.top_k > 1:
+            ranking = self.load_pattern_ranking()
+            return lambda chunk: email_engine.candidates_frame(
+                chunk, ranking, self.top_k, self.domain_index, self.known_people
+            )
+        if task == 'generate':
+            return lambda chunk: email_engine.generate_frame(
+                chunk, self.email_patterns, self.domain_index, self.known_people
+            )
+        return email_engine.predict_frame
+
+    def process_backend(self, task):
+        """Process pool for the current worker setting, or None to run in this process"""
+        workers = self.worker_count
+        if workers > 1 and task == 'generate' and self.top_k > 1:
+            return ProcessBackend('candidates', workers, store_path=self.pattern_store.path, top_k=self.top_k)
+        if workers > 1 and task == 'generate':
+            # Workers read the patterns, confidences and known people from the store themselves
+            return ProcessBackend(task, workers, store_path=self.pattern_store.path)
+        if workers > 1:
+            return ProcessBackend(task, workers)
+        return None
+
+    @contextlib.contextmanager
+    def verification(self, task, cancel_event=None):
+        """finish_chunk that verifies each result chunk's emails, or None when verification is off"""
+        if not self.verify or task == 'analyze':
+            yield None
+            return
 
-            result_df = self.process_data()
-            if result_df is not None:
-                self.progress_bar['value'] = 70
-                self.status_label.config(text="Updating preview...")
+        email_column = email_engine.EMAIL_COLUMNS['candidates' if task == 'generate' and self.top_k > 1 else task]
+        with EmailVerifier() as verifier:
+            def finish_chunk(result_chunk):
+                result_chunk = verify_frame(result_chunk, email_column, verifier, cancel_event=cancel_event)
+                # A chunk cancelled part way is never kept, so a resumed run verifies it again
+                email_engine.check_cancelled(cancel_event)
+                return result_chunk
+
+            yield finish_chunk
+
+    def run_pipeline(self, task, df, on_chunk=None, job_checkpoint=None, cancel_event=None):
+        """Run a pipeline over df chunk by chunk, on the process pool when workers > 1"""
+        if job_checkpoint is not None:
+            return self.run_checkpointed(task, df, on_chunk, job_checkpoint, cancel_event)
+
+        backend = self.process_backend(task)
+        with self.verification(task, cancel_event) as finish_chunk:
+            if backend is None:
+                return email_engine.run_chunked(
+                    df, self.pipeline_func(task), self.chunk_size, on_chunk, cancel_event, finish_chunk
+                )
+
+            with backend:
+                return backend.run_chunked(df, self.chunk_size, on_chunk, cancel_event, finish_chunk)
+
+    def run_checkpointed(self, task, df, on_chunk, job_checkpoint, cancel_event):
+        """run_pipeline that also spools each finished chunk to the checkpoint's file.
+
+        A resumed run reads back the rows spooled before the checkpoint and
+        only processes the rest of df. The spool is deleted once the run
+        completes.
+        """
+        rows_read, rows_written = job_checkpoint.resume_point()
+        done_df = job_checkpoint.read_output() if rows_written else None
+        if done_df is not None and on_chunk is not None:
+            on_chunk(done_df, rows_read, len(df))
+
+        columns = {name: name for name in job_checkpoint.columns}
+        os.makedirs(os.path.dirname(job_checkpoint.output_path), exist_ok=True)
+        with file_io.ChunkWriter(job_checkpoint.output_path, columns, append_rows=rows_written) as writer:
+            def on_result(result_chunk, rows_done, total_rows):
+                writer.write(email_engine.export_frame(result_chunk, columns))
+                job_checkpoint.save(rows_read + rows_done, writer.rows)
+                if on_chunk is not None:
+                    on_chunk(result_chunk, rows_read + rows_done, rows_read + total_rows)
+
+            df = self.run_pipeline(task, df.iloc[rows_read:], on_result, cancel_event=cancel_event)
+
+        job_checkpoint.remove(output=True)
+        return email_engine.concat_frames([done_df, df]) if done_df is not None else df
+
+    def start_streaming(self, task, input_path, export_columns, preview_columns, initialfile,
+                        progress_bar, status_label, on_done=None):
+        """Ask for an output file, then stream the input through the pipeline into it chunk by chunk"""
+        output_path = filedialog.asksaveasfilename(
+            defaultextension='.csv',
+            filetypes=OUTPUT_FILETYPES,
+            initialfile=initialfile
+        )
+        if not output_path:
+            return
 
-                self.update_results(result_df)
+        job_checkpoint = self.prepare_checkpoint(task, input_path, output_path, export_columns)
+        status_label.config(text="Streaming...", fg=self.text_color)
+        progress_bar.config(mode='indeterminate')
+        progress_bar.start()
+        self.start_thread(
+            task,
+            self._stream_thread,
+            task, input_path, output_path, export_columns, preview_columns,
+            progress_bar, status_label, on_done, job_checkpoint
+        )
 
-                self.progress_bar['value'] = 100
-                self.status_label.config(text="Processing complete!", fg=self.success_color)
-                self.download_button.config(state='normal')
+    def _stream_thread(self, task, input_path, output_path, export_columns, preview_columns,
+                       progress_bar, status_label, on_done, job_checkpoint=None):
+        """Thread for streaming a file; only the first chunk is kept for the preview"""
+        backend = None
+        profile = self.profiles[task]
+        profile.start()
+        try:
+            first_chunk = True
+
+            def on_chunk(chunk_df, rows_done):
+                nonlocal first_chunk
+                if task == 'analyze':
+                    # Patterns are stored from this process only, in input order
+                    with profile.stage('store', len(chunk_df)):
+                        self.pattern_store.add_frame(chunk_df)
+                if first_chunk:
+                    first_chunk = False
+                    self.ui.post(self.timed, profile, 'preview', self.show_results, chunk_df, preview_columns)
+                self.ui.post_latest((status_label, 'text'), status_label.config, text=f"Written {rows_done} rows...")
+
+            backend = self.process_backend(task)
+            # Reading, processing and writing overlap chunk by chunk, so they are one stage
+            started = time.perf_counter()
+            with self.verification(task, self.cancel_events[task]) as finish_chunk:
+                rows_done = email_engine.stream_file(
+                    input_path,
+                    output_path,
+                    self.pipeline_func(task),
+                    export_columns,
+                    chunk_size=self.chunk_size,
+                    on_chunk=on_chunk,
+                    map_chunks=backend.map if backend is not None else None,
+                    required_columns=email_engine.TASK_COLUMNS[task],
+                    checkpoint=job_checkpoint,
+                    cancel_event=self.cancel_events[task],
+                    finish_chunk=finish_chunk
+                )
+            profile.add('stream', time.perf_counter() - started, rows_done)
+            if on_done is not None:
+                with profile.stage('reload patterns'):
+                    on_done()
+            self.keep_counts(profile)
+            self.ui.post(self.show_completion, status_label, f"Streaming complete! {rows_done} rows saved", profile)
+
+        except email_engine.JobCancelled:
+            if task == 'analyze':
+                logger.warning("Streaming analysis cancelled; patterns of the chunks already written stay stored")
+            self.keep_counts(profile)
+            self.ui.post(self.show_cancelled, status_label, profile, job_checkpoint)
+        except Exception as e:
+            logger.error(f"Error in streaming: {str(e)}")
+            self.ui.post(messagebox.showerror, "Error", str(e))
+            self.ui.post(status_label.config, text="Error occurred", fg=self.warning_color)
+        finally:
+            profile.stop()
+            if backend is not None:
+                backend.close()
+            self.ui.post(progress_bar.stop)
+            self.ui.post(progress_bar.config, mode='determinate', value=0)
+            self.ui.post(self.finish_job, task)
 
+    def _process_thread(self):
+        profile = self.profiles['analyze']
+        profile.start()
+        try:
+            result_df = self.process_data(
+                on_chunk=self._on_analyze_chunk, profile=profile, cancel_event=self.cancel_events['analyze']
+            )
+            if result_df is not None:
+                self.ui.post(self.timed, profile, 'preview', self.show_results, result_df, PATTERN_PREVIEW)
+                self.ui.post(self.progress_bar1.config, value=100)
+                self.keep_counts(profile)
+                self.ui.post(self.show_completion, self.status_label1, "Processing complete!", profile)
+                self.ui.post(self.download_button.config, state='normal')
+
+        except email_engine.JobCancelled:
+            self.keep_counts(profile)
+            self.ui.post(self.show_cancelled, self.status_label1, profile)
         except Exception as e:
-            print(f"Error in processing: {str(e)}")
-            messagebox.showerror("Error", str(e))
-            self.status_label.config(text="Error occurred", fg=self.warning_color)
+            logger.error(f"Error in processing: {str(e)}")
+            self.ui.post(messagebox.showerror, "Error", str(e))
+            self.ui.post(self.status_label1.config, text="Error occurred", fg=self.warning_color)
         finally:
-            self.process_button.config(state='normal')
+            profile.stop()
+            self.ui.post(self.finish_job, 'analyze')
+
+    def _on_analyze_chunk(self, chunk_df, rows_done, total_rows):
+        """Progress callback for chunked pattern analysis"""
+        self.post_progress(self.progress_bar1, self.status_label1, rows_done / total_rows * 100,
+                           f"Analyzed {rows_done} of {total_rows} rows...")
 
-    def process_data(self):
+    def process_data(self, on_chunk=None, profile=None, cancel_event=None):
+        profile = profile or RunProfile('analyze')
         try:
             if self.df is None:
                 raise ValueError("No data available")
 
-            df = self.df.copy()
-            df['client'] = df['First Name'] + ' ' + df['Last Name']
-
-            def analyze_email(row):
-                try:
-                    email = str(row['Email']).lower()
-                    domain = email.split('@')[1]
-                    username = email.split('@')[0]
-                    first_name = str(row['First Name']).lower().strip()
-                    last_name = str(row['Last Name']).lower().strip()
-
-                    # Print debug information
-                    print(f"\nAnalyzing email: {email}")
-                    print(f"First Name: {first_name}")
-                    print(f"Last Name: {last_name}")
-                    print(f"Username: {username}")
-
-                    # Enhanced pattern detection with more specific cases
-                    if username == f"d{first_name}":  # djoe
-                        format_type = 'LastNameFirstLetterFirstName'
-                    elif username == f"{first_name}{first_name[0]}":  # fernandof
-                        format_type = 'FirstNameFirstLetterLastName'
-                    elif username == f"{first_name}{last_name[0]}":  # ashleyj
-                        format_type = 'FirstNameFirstLetterLastName'
-                    elif username == f"{first_name}{last_name}":  # willcom
-                        format_type = 'FirstNameLastName'
-                    elif username == f"{first_name}{last_name[0]}":  # lisaa
-                        format_type = 'FirstNameFirstLetterLastName'
-                    elif username == f"{first_name[0]}{last_name}":
-                        format_type = 'FirstLetterLastName'
-                    elif username == f"{first_name}.{last_name}":
-                        format_type = 'FirstName.LastName'
-                    elif username == f"{first_name}_{last_name}":
-                        format_type = 'FirstName_LastName'
-                    elif username == last_name:
-                        format_type = 'LastName'
-                    elif username == first_name:
-                        format_type = 'FirstName'
-                    else:
-                        # Additional pattern checks
-                        if username.startswith(first_name.lower()):
-                            format_type = 'FirstNameFirstLetterLastName'
-                        elif username.startswith('d'):
-                            format_type = 'LastNameFirstLetterFirstName'
-                        else:
-                            print(f"Unrecognized pattern for: {email}")
-                            format_type = 'FirstNameFirstLetterLastName'  # Default pattern
-
-                    # Add domain to format
-                    format_with_domain = f"{format_type}@{domain}"
-                    print(f"Detected format: {format_with_domain}")
-                    return domain, format_with_domain
-
-                except Exception as e:
-                    print(f"Error analyzing email: {str(e)}")
-                    return None, 'invalid'
-
-            df[['domain', 'format']] = pd.DataFrame(df.apply(analyze_email, axis=1).tolist(), index=df.index)
-
-            # Store patterns by domain
-            self.email_patterns = {}
-            for _, row in df.iterrows():
-                if pd.notna(row['domain']):
-                    pattern = row['format'].split('@')[0]  # Remove domain part for storage
-                    self.email_patterns[row['domain']] = pattern
-                    print(f"Stored pattern for {row['domain']}: {pattern}")
+            # A cancelled analysis stops here, before anything is stored
+            with profile.stage('analyze', len(self.df)):
+                df = self.run_pipeline('analyze', self.df, on_chunk=on_chunk, cancel_event=cancel_event)
+
+            # Add this batch to the persistent store and reload the merged patterns
+            with profile.stage('store', len(df)):
+                self.pattern_store.add_frame(df)
+            with profile.stage('reload patterns'):
+                self.reload_patterns()
 
             self.processed_df = df
             return df
 
+        except email_engine.JobCancelled:
+            raise
         except Exception as e:
-            print(f"Error in process_data: {str(e)}")
-            messagebox.showerror("Error", f"Error processing data: {str(e)}")
+            logger.error(f"Error in process_data: {str(e)}")
+            self.ui.post(messagebox.showerror, "Error", f"Error processing data: {str(e)}")
             return None
 
-    def update_results(self, df):
-        try:
-            # Clear existing items
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            # Insert new data
-            for _, row in df.iterrows():
-                values = (
-                    row['client'],
-                    row.get('domain', ''),
-                    row.get('format', ''),
-                    row['Email']
-                )
-                self.tree.insert('', 'end', values=values)
-
-        except Exception as e:
-            print(f"Error updating results: {str(e)}")
-            messagebox.showerror("Error", f"Error showing results: {str(e)}")
-
     def run(self):
         self.root.mainloop()
 
 if __name__ == "__main__":
+    configure_logging(verbose='--verbose' in sys.argv[1:])
     app = TreeBusinessGUI()
     app.run()
\ No newline at end of file
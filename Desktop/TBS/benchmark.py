@@ -0,0 +1,237 @@
+"""Benchmarks for the pattern analysis, generation and prediction pipelines.
+
+Each pipeline is timed headlessly on seeded synthetic data at several sizes,
+every case in a fresh process so its peak memory is measured on its own:
+
+    python -m benchmark
+    python -m benchmark --sizes 10000 100000 --pipelines generate -o before.json
+
+Results (rows/sec and peak RSS per case) are written as JSON so runs from
+different versions can be compared.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+import email_engine
+from domain_index import DomainIndex
+from pattern_store import PatternStore
+from patterns import PATTERNS
+from run_profile import peak_rss_mb
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+PIPELINES = ['analyze', 'generate', 'predict']
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth',
+    'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Daniel', 'Lisa', 'Matthew', 'Nancy', 'Anthony', 'Betty', 'Mark', 'Sandra', 'Donald', 'Ashley',
+    'Fernando', 'Priya', 'Wei', 'Aisha', 'Mohammed', 'Olga', 'Hiroshi', 'Sofia', 'Lucas', 'Chloe',
+    'José', 'Zoë', 'Björn', 'Anne-Marie', 'Seán', 'Dev', 'Al', 'Jo', 'Will', 'Dana',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Lewis', 'Robinson', 'Walker',
+    'Patel', 'Nguyen', 'Kim', 'Chen', 'Singh', 'Müller', 'Ó Briain', "O'Neil", 'Smith-Jones', 'Com',
+]
+SYLLABLES = ['ac', 'me', 'tri', 'on', 'blue', 'tree', 'corp', 'data', 'nova', 'green', 'sys', 'net',
+             'vis', 'ta', 'glo', 'bal', 'bright', 'path', 'stone', 'ware', 'lab', 'hub', 'max', 'pro']
+TLDS = ['.com', '.com', '.com', '.org', '.net', '.io', '.co.uk', '.de']
+
+# Share of companies using each pattern; the remainder use made-up usernames
+PATTERN_MIX = {
+    'FirstName.LastName': 0.40,
+    'FirstLetterLastName': 0.20,
+    'FirstNameLastName': 0.10,
+    'FirstNameFirstLetterLastName': 0.10,
+    'FirstName_LastName': 0.05,
+    'FirstName': 0.04,
+    'LastName': 0.04,
+    'LastNameFirstLetterFirstName': 0.02,
+}
+UNRECOGNIZED_SHARE = 0.05
+
+# How lead URLs are written, as (template, share)
+URL_VARIANTS = [
+    ('https://www.{}', 0.35),
+    ('http://{}/about', 0.15),
+    ('{}', 0.20),
+    ('www.{}/contact', 0.10),
+    ('HTTPS://WWW.{}/', 0.05),
+    ('https://careers.{}/jobs', 0.10),  # subdomain -> fallback lookup
+    ('https://{}?ref=linkedin', 0.05),
+]
+
+
+def synthetic_domains(rng, count):
+    """Distinct company domains built from syllables and common TLDs"""
+    domains = set()
+    while len(domains) < count:
+        size = count - len(domains)
+        parts = rng.choice(SYLLABLES, size=(size, 3))
+        lengths = rng.integers(1, 4, size=size)
+        tlds = rng.choice(TLDS, size=size)
+        for row, length, tld in zip(parts, lengths, tlds):
+            domains.add(''.join(row[:length]) + str(rng.integers(0, 1000)) + tld)
+    return np.array(sorted(domains), dtype=object)
+
+
+def synthetic_people(rng, rows):
+    return pd.DataFrame({
+        'First Name': rng.choice(FIRST_NAMES, size=rows),
+        'Last Name': rng.choice(LAST_NAMES, size=rows),
+    })
+
+
+def synthetic_pattern_frame(rows, seed=42):
+    """Verified-email training data: each company mostly follows one pattern"""
+    rng = np.random.default_rng(seed)
+    domains = synthetic_domains(rng, max(1, rows // 20))
+    domain_patterns = rng.choice(list(PATTERN_MIX), size=len(domains), p=np.array(list(PATTERN_MIX.values())) / sum(PATTERN_MIX.values()))
+
+    df = synthetic_people(rng, rows)
+    picks = rng.integers(0, len(domains), size=rows)
+    patterns = pd.Series(domain_patterns[picks], dtype=object)
+    usernames = PATTERNS.synthesize(
+        email_engine.normalize_names(df['First Name']),
+        email_engine.normalize_names(df['Last Name']),
+        patterns
+    )
+    noise = rng.random(rows) < UNRECOGNIZED_SHARE
+    usernames[noise] = pd.Series(rng.integers(100, 100000, size=int(noise.sum()))).map(lambda n: f"x{n}").to_numpy()
+    df['Email'] = usernames.fillna('info') + '@' + pd.Series(domains[picks], dtype=object)
+    return df
+
+
+def synthetic_leads(rows, seed=42):
+    """Lead list with URL variants; about one in five companies is unknown"""
+    rng = np.random.default_rng(seed + 1)
+    known = synthetic_domains(np.random.default_rng(seed), max(1, rows // 20))
+    unknown = np.array([f"new{d}" for d in known[: max(1, len(known) // 4)]], dtype=object)
+    domains = np.concatenate([known, unknown])
+
+    df = synthetic_people(rng, rows)
+    templates = [template for template, _ in URL_VARIANTS]
+    shares = np.array([share for _, share in URL_VARIANTS])
+    variant = rng.choice(len(templates), size=rows, p=shares / shares.sum())
+    picked = domains[rng.integers(0, len(domains), size=rows)]
+    df['URL'] = [templates[v].format(d.upper() if templates[v].isupper() else d) for v, d in zip(variant, picked)]
+    return df
+
+
+def synthetic_predictor_frame(rows, seed=42):
+    """Predictor data with an explicit Email Format and Domain per row"""
+    rng = np.random.default_rng(seed + 2)
+    df = synthetic_people(rng, rows)
+    df['Email Format'] = rng.choice(list(PATTERN_MIX), size=rows)
+    df['Domain'] = synthetic_domains(rng, max(1, rows // 20))[rng.integers(0, max(1, rows // 20), size=rows)]
+    return df
+
+
+def run_case(pipeline, rows, seed, chunk_size):
+    """Time one pipeline on one size; runs in its own process"""
+    # Temporary files of a case are removed once it is timed
+    with contextlib.ExitStack() as cleanup:
+        if pipeline == 'analyze':
+            df = synthetic_pattern_frame(rows, seed)
+            store_dir = cleanup.enter_context(tempfile.TemporaryDirectory())
+            store = PatternStore(os.path.join(store_dir, 'benchmark_patterns.db'))
+            cleanup.callback(store.close)
+
+            def work():
+                # Same steps as process_data: classify, store, reload
+                result_df = email_engine.run_chunked(df, email_engine.analyze_frame, chunk_size)
+                store.add_frame(result_df)
+                DomainIndex(store.load_patterns(), store.load_confidence())
+                return result_df
+        elif pipeline == 'generate':
+            training = synthetic_pattern_frame(rows, seed)
+            analyzed = email_engine.analyze_frame(training)
+            email_patterns = dict(zip(analyzed['domain'], analyzed['format'].str.split('@').str[0]))
+            email_patterns.pop(None, None)
+            domain_index = DomainIndex(email_patterns)
+            df = synthetic_leads(rows, seed)
+
+            def work():
+                return email_engine.run_chunked(
+                    df, lambda chunk: email_engine.generate_frame(chunk, email_patterns, domain_index), chunk_size
+                )
+        else:
+            df = synthetic_predictor_frame(rows, seed)
+
+            def work():
+                return email_engine.run_chunked(df, email_engine.predict_frame, chunk_size)
+
+        started = time.perf_counter()
+        result_df = work()
+        seconds = time.perf_counter() - started
+        return {
+            'pipeline': pipeline,
+            'rows': rows,
+            'result_rows': len(result_df),
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmark', description="Benchmark the email pipelines on synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="row counts to test")
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=PIPELINES)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=email_engine.DEFAULT_CHUNK_SIZE)
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for pipeline in args.pipelines:
+        for rows in args.sizes:
+            # A fresh process per case keeps peak RSS from leaking between cases
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(run_case, pipeline, rows, args.seed, args.chunk_size).result()
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'chunk_size': args.chunk_size,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
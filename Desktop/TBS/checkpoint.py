@@ -0,0 +1,139 @@
+"""Checkpoints that let long generation jobs resume after a crash or cancel.
+
+After every chunk a job saves a small JSON manifest next to its output: the
+input file's size and modification time, how many input rows have been processed, how many output
+rows (and bytes) were written, and the pattern store version it ran with.
+Started again with the same input, settings and store version, the job
+skips the processed rows, cuts the output back to the checkpointed size
+(dropping a half-written chunk) and appends the rest.
+
+Only CSV and .csv.gz outputs can be appended to, so only they are
+checkpointed. Jobs that keep their result in memory checkpoint to a spool
+CSV in DEFAULT_CHECKPOINT_DIR instead.
+
+The input is identified by size and mtime rather than a hash of its
+contents, so starting a job never costs an extra pass over a large file.
+"""
+import datetime
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import file_io
+from run_log import logger
+
+# Spool files of in-memory jobs, next to the application
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_checkpoints')
+MANIFEST_SUFFIX = '.checkpoint.json'
+
+
+def file_stamp(path):
+    """[size, mtime in ns] of a file; changes whenever the file is rewritten"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def can_checkpoint(output_path):
+    return file_io.file_format(output_path) == 'csv'
+
+
+def spool_path(task, input_path, checkpoint_dir=DEFAULT_CHECKPOINT_DIR):
+    """Spool CSV for an in-memory job on input_path"""
+    key = hashlib.sha1(os.path.abspath(input_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(checkpoint_dir, f"{task}-{key}.csv")
+
+
+class JobCheckpoint:
+    """Progress manifest of one job writing output_path; see the module docstring"""
+
+    def __init__(self, task, input_path, output_path, columns, chunk_size, store_version=None):
+        self.task = task
+        self.input_path = os.path.abspath(input_path)
+        self.output_path = output_path
+        self.columns = list(columns)
+        self.chunk_size = chunk_size
+        self.store_version = store_version
+        self.manifest_path = output_path + MANIFEST_SUFFIX
+        self.input_stamp = None
+
+    def settings(self):
+        """Manifest fields that must match for a job to resume"""
+        return {
+            'task': self.task,
+            'input_path': self.input_path,
+            'columns': self.columns,
+            'chunk_size': self.chunk_size,
+            'store_version': self.store_version,
+        }
+
+    def load(self):
+        """The saved manifest, or None if there is none or it is unreadable"""
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.manifest_path}: {str(e)}")
+            return None
+
+    def pending(self):
+        """Saved manifest for the same job settings, whether or not the input changed since"""
+        manifest = self.load()
+        if manifest is None:
+            return None
+        if any(manifest.get(key) != value for key, value in self.settings().items()):
+            return None
+        return manifest
+
+    def resume_point(self):
+        """(input rows, output rows) to continue from; (0, 0) starts over.
+
+        When the manifest still matches, the output is truncated to its
+        checkpointed size.
+        """
+        self.input_stamp = file_stamp(self.input_path)
+        manifest = self.pending()
+        if manifest is None:
+            return 0, 0
+        if manifest.get('input_stamp') != self.input_stamp:
+            logger.warning(f"Input {self.input_path} changed since its checkpoint; starting over")
+            return 0, 0
+        if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) < manifest['output_bytes']:
+            logger.warning(f"Output {self.output_path} is shorter than its checkpoint; starting over")
+            return 0, 0
+
+        with open(self.output_path, 'r+b') as f:
+            f.truncate(manifest['output_bytes'])
+        logger.info(f"Resuming {self.task} at input row {manifest['rows_read']}")
+        return manifest['rows_read'], manifest['rows_written']
+
+    def save(self, rows_read, rows_written):
+        """Record progress after a chunk is fully written"""
+        manifest = self.settings()
+        manifest.update({
+            'input_stamp': self.input_stamp,
+            'output_path': os.path.abspath(self.output_path),
+            'output_bytes': os.path.getsize(self.output_path),
+            'rows_read': rows_read,
+            'rows_written': rows_written,
+            'updated': datetime.datetime.now().isoformat(timespec='seconds'),
+        })
+        # Replaced atomically, so a crash never leaves half a manifest
+        partial = self.manifest_path + '.partial'
+        with open(partial, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(partial, self.manifest_path)
+
+    def read_output(self):
+        """Rows written before the checkpoint, as text columns"""
+        return pd.read_csv(self.output_path, dtype=object)
+
+    def remove(self, output=False):
+        """Delete the manifest, and the output too for a spool file"""
+        paths = [self.manifest_path] + ([self.output_path] if output else [])
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
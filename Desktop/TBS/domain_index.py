@@ -0,0 +1,83 @@
+# Length of the substrings used to find known domains that contain a lead domain
+GRAM_SIZE = 3
+
+# Known domains whose consensus pattern covers less than this share of their
+# emails are only used for themselves, never lent to related domains
+MIN_FALLBACK_CONFIDENCE = 0.5
+
+
+class DomainIndex:
+    """Indexed version of the fallback domain scan in generate_email.
+
+    The scan picked the first known domain (in insertion order) that is a
+    substring of the lead domain or contains it. The index answers the same
+    question from two lookups instead of walking every known domain:
+
+    - known domains inside the lead domain: every substring of the lead
+      domain whose length matches some known domain is looked up directly
+    - known domains containing the lead domain: candidates come from the
+      rarest trigram of the lead domain and are checked in insertion order
+
+    The index is built once from a snapshot of the pattern map, and of the
+    domain -> confidence map of PatternStore.load_confidence() if given;
+    find() then skips domains below min_confidence.
+    """
+
+    def __init__(self, email_patterns, confidence=None, min_confidence=MIN_FALLBACK_CONFIDENCE):
+        self.patterns = dict(email_patterns)
+        self.confidence = dict(confidence or {})
+        self.domains = [
+            domain for domain in self.patterns if self.confidence.get(domain, 1.0) >= min_confidence
+        ]
+        self.ranks = {domain: rank for rank, domain in enumerate(self.domains)}
+        self.lengths = sorted({len(domain) for domain in self.domains})
+
+        self.short_substrings = {}  # substrings shorter than GRAM_SIZE -> first rank
+        self.grams = {}  # trigram -> ascending ranks of domains containing it
+        for rank, domain in enumerate(self.domains):
+            for size in range(GRAM_SIZE):
+                for start in range(len(domain) - size + 1):
+                    self.short_substrings.setdefault(domain[start:start + size], rank)
+
+            seen = set()
+            for start in range(len(domain) - GRAM_SIZE + 1):
+                gram = domain[start:start + GRAM_SIZE]
+                if gram not in seen:
+                    seen.add(gram)
+                    self.grams.setdefault(gram, []).append(rank)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def find(self, domain):
+        """First known domain related to domain by containment, or None"""
+        best = len(self.domains)
+
+        # Known domains that are substrings of the lead domain
+        for size in self.lengths:
+            if size > len(domain):
+                break
+            for start in range(len(domain) - size + 1):
+                rank = self.ranks.get(domain[start:start + size])
+                if rank is not None and rank < best:
+                    best = rank
+
+        # Known domains that contain the lead domain
+        if len(domain) < GRAM_SIZE:
+            rank = self.short_substrings.get(domain)
+            if rank is not None and rank < best:
+                best = rank
+        else:
+            candidates = min(
+                (self.grams.get(domain[start:start + GRAM_SIZE], ())
+                 for start in range(len(domain) - GRAM_SIZE + 1)),
+                key=len
+            )
+            for rank in candidates:
+                if rank >= best:
+                    break
+                if domain in self.domains[rank]:
+                    best = rank
+                    break
+
+        return self.domains[best] if best < len(self.domains) else None
@@ -0,0 +1,274 @@
+"""Headless batch entry point for the email pattern pipelines.
+
+Runs the same engine code as the GUI without importing tkinter:
+
+    python -m email_cli analyze patterns.csv -o pattern_analysis_results.csv
+    python -m email_cli generate leads.csv -o email_predictions.csv
+    python -m email_cli predict predictor.csv -o email_predictions.csv
+    python -m email_cli consensus -o pattern_consensus.csv
+
+Input and output may be CSV, .csv.gz, Parquet or Feather files, chosen by
+extension; only the columns a command needs are read. Input is streamed
+chunk by chunk; with --checkpoint, generate and predict can resume an
+interrupted run; with --verify, each email is checked against its domain's
+mail server and a Verification column is added. consensus writes the
+pattern store's majority pattern, support and confidence per domain. A
+single JSON line with row counts, timings and run counters is printed to
+stdout; log output goes to stderr and stays quiet unless --verbose is given.
+"""
+import argparse
+import functools
+import json
+import sys
+import time
+
+import pandas as pd
+
+import email_engine
+import file_io
+from checkpoint import JobCheckpoint, can_checkpoint
+from domain_index import DomainIndex
+from email_verify import DEFAULT_MAIL_FROM, VERIFICATION_EXPORT, EmailVerifier, verify_frame
+from known_people import KnownPeople
+from parallel import ProcessBackend, default_workers
+from pattern_ranking import PatternRanking
+from pattern_store import CONSENSUS_COLUMNS, DEFAULT_STORE_PATH, PatternStore
+from run_log import configure_logging, counters
+
+
+def process_backend(args, task, **worker_args):
+    """Process pool for --workers above 1, else None to run in this process"""
+    if args.workers > 1:
+        return ProcessBackend(task, args.workers, **worker_args)
+    return None
+
+
+def job_checkpoint(args, columns, store_version=None):
+    """Checkpoint for --checkpoint runs, or None"""
+    if not args.checkpoint:
+        return None
+    if not can_checkpoint(args.output):
+        raise ValueError("--checkpoint needs a .csv or .csv.gz output")
+    return JobCheckpoint(args.command, args.input, args.output, columns, args.chunk_size, store_version)
+
+
+def host_port(value):
+    """'host' or 'host:port' as (host, port), port 53 by default"""
+    host, _, port = value.rpartition(':') if ':' in value else (value, '', '53')
+    return host, int(port)
+
+
+def email_verifier(args):
+    """EmailVerifier for --verify runs, or None"""
+    if not args.verify:
+        return None
+    mx_hosts = {}
+    for mapping in args.mx_host:
+        domain, _, host = mapping.partition('=')
+        mx_hosts.setdefault(domain, []).append(host)
+    return EmailVerifier(
+        mail_from=args.mail_from,
+        port=args.smtp_port,
+        mx_hosts=mx_hosts,
+        nameservers=[host_port(server) for server in args.dns_server] or None
+    )
+
+
+def verified_columns(args, columns):
+    return {**columns, **VERIFICATION_EXPORT} if args.verify else columns
+
+
+def stream(args, func, columns, backend, on_chunk=None, checkpoint=None, verifier=None, task=None):
+    finish_chunk = None
+    if verifier is not None:
+        email_column = email_engine.EMAIL_COLUMNS[task or args.command]
+        finish_chunk = lambda result_chunk: verify_frame(result_chunk, email_column, verifier)
+    return email_engine.stream_file(
+        args.input,
+        args.output,
+        func,
+        columns,
+        chunk_size=args.chunk_size,
+        on_chunk=on_chunk,
+        map_chunks=backend.map if backend is not None else None,
+        required_columns=email_engine.TASK_COLUMNS[args.command],
+        checkpoint=checkpoint,
+        finish_chunk=finish_chunk
+    )
+
+
+def run_analyze(args):
+    store = PatternStore(args.store)
+    backend = process_backend(args, 'analyze')
+
+    try:
+        # Patterns are written from this process only, in input order
+        rows = stream(
+            args,
+            email_engine.analyze_frame,
+            email_engine.PATTERN_EXPORT,
+            backend,
+            on_chunk=lambda result_df, rows_done: store.add_frame(result_df)
+        )
+    finally:
+        if backend is not None:
+            backend.close()
+    return rows, {'domains': len(store.load_patterns()), 'store_version': store.version()}
+
+
+def run_generate(args):
+    store = PatternStore(args.store, read_only=True)
+    email_patterns = store.load_patterns()
+    if not email_patterns:
+        raise ValueError("No email patterns available. Please process pattern file first!")
+    domain_index = DomainIndex(email_patterns, store.load_confidence())
+    known_people = KnownPeople(store.load_known())
+
+    if args.top_k > 1:
+        ranking = PatternRanking(store.load_counts())
+        # Workers read the patterns and counts from the store themselves
+        backend = process_backend(args, 'candidates', store_path=args.store, top_k=args.top_k)
+        func = functools.partial(
+            email_engine.candidates_frame, ranking=ranking, k=args.top_k, domain_index=domain_index,
+            known_people=known_people
+        )
+        task = 'candidates'
+        columns = verified_columns(args, email_engine.CANDIDATE_EXPORT)
+    else:
+        backend = process_backend(args, 'generate', store_path=args.store)
+        func = functools.partial(
+            email_engine.generate_frame, email_patterns=email_patterns, domain_index=domain_index,
+            known_people=known_people
+        )
+        task = 'generate'
+        columns = verified_columns(args, email_engine.GENERATE_EXPORT)
+
+    verifier = email_verifier(args)
+    try:
+        rows = stream(args, func, columns, backend, checkpoint=job_checkpoint(args, columns, store.version()),
+                      verifier=verifier, task=task)
+    finally:
+        if backend is not None:
+            backend.close()
+        if verifier is not None:
+            verifier.close()
+    return rows, {'domains': len(email_patterns), 'known_people': len(known_people), 'store_version': store.version()}
+
+
+def run_predict(args):
+    backend = process_backend(args, 'predict')
+    columns = verified_columns(args, email_engine.PREDICT_EXPORT)
+
+    verifier = email_verifier(args)
+    try:
+        rows = stream(
+            args,
+            email_engine.predict_frame,
+            columns,
+            backend,
+            checkpoint=job_checkpoint(args, columns),
+            verifier=verifier
+        )
+    finally:
+        if backend is not None:
+            backend.close()
+        if verifier is not None:
+            verifier.close()
+    return rows, {}
+
+
+def run_consensus(args):
+    store = PatternStore(args.store, read_only=True)
+    consensus = pd.DataFrame(store.load_consensus(), columns=CONSENSUS_COLUMNS)
+    file_io.write_frame(consensus, args.output)
+    return len(consensus), {'store_version': store.version()}
+
+
+# command -> (run function, required input columns or None for no input, default output)
+COMMANDS = {
+    'analyze': (run_analyze, email_engine.PATTERN_COLUMNS, 'pattern_analysis_results.csv'),
+    'generate': (run_generate, email_engine.GENERATE_COLUMNS, 'email_predictions.csv'),
+    'predict': (run_predict, email_engine.PREDICT_COLUMNS, 'email_predictions.csv'),
+    'consensus': (run_consensus, None, 'pattern_consensus.csv'),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='email_cli', description="Email pattern analysis without the GUI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    helps = {
+        'analyze': "detect patterns in a CSV of verified emails and add them to the pattern store",
+        'generate': "generate emails for a lead list from the pattern store",
+        'predict': "build emails from a CSV that already states each person's format and domain",
+        'consensus': "write the majority pattern of each stored domain with its support and confidence",
+    }
+    for name, (_, required_columns, default_output) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=helps[name])
+        if required_columns is not None:
+            sub.add_argument('input', help="input file: .csv, .csv.gz, .parquet or .feather")
+        sub.add_argument('-o', '--output', default=default_output,
+                         help=f"output file, format by extension as for input (default: {default_output})")
+        if required_columns is not None:
+            sub.add_argument('--chunk-size', type=int, default=email_engine.DEFAULT_CHUNK_SIZE,
+                             help="rows processed per chunk")
+            sub.add_argument('--workers', type=int, default=1,
+                             help=f"worker processes; 1 runs in this process "
+                                  f"(this machine has {default_workers()} cores)")
+        else:
+            sub.set_defaults(input=None, workers=1)
+        sub.add_argument('-v', '--verbose', action='store_true',
+                         help="log progress and sampled examples of unusual rows")
+        if name != 'predict':
+            sub.add_argument('--store', default=DEFAULT_STORE_PATH, help="pattern store database")
+        if name == 'generate':
+            sub.add_argument('--top-k', type=int, default=1,
+                             help="above 1, write the K best-ranked candidate emails per lead, one row each")
+        if name in ('generate', 'predict'):
+            sub.add_argument('--checkpoint', action='store_true',
+                             help="checkpoint a CSV output after every chunk and resume from an earlier checkpoint")
+            sub.add_argument('--verify', action='store_true',
+                             help="check each email with an SMTP RCPT probe and add a Verification column")
+            sub.add_argument('--mail-from', default=DEFAULT_MAIL_FROM, help="sender address of the SMTP probes")
+            sub.add_argument('--smtp-port', type=int, default=25, help="SMTP port of the mail hosts")
+            sub.add_argument('--mx-host', action='append', default=[], metavar='DOMAIN=HOST',
+                             help="use HOST as a mail host of DOMAIN instead of looking it up; repeatable")
+            sub.add_argument('--dns-server', action='append', default=[], metavar='HOST[:PORT]',
+                             help="DNS server for MX lookups (needs dnspython); repeatable")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    run, required_columns, _ = COMMANDS[args.command]
+
+    configure_logging(args.verbose)
+    counters.reset()
+
+    started = time.perf_counter()
+    try:
+        if required_columns is not None:
+            # Validate the input header before any rows are parsed
+            email_engine.input_columns(args.input, required_columns)
+        rows, extra = run(args)
+    except Exception as e:
+        print(json.dumps({'command': args.command, 'error': str(e)}))
+        return 1
+    seconds = time.perf_counter() - started
+
+    report = {
+        'command': args.command,
+        'input': args.input,
+        'output': args.output,
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None,
+        'workers': args.workers,
+        'counters': counters.snapshot(),
+    }
+    report.update(extra)
+    print(json.dumps(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
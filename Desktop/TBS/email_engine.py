@@ -0,0 +1,657 @@
+import collections
+import functools
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import file_io
+from domain_index import MIN_FALLBACK_CONFIDENCE, DomainIndex
+from known_people import person_keys
+from pattern_ranking import DEFAULT_TOP_K
+from patterns import DEFAULT_PATTERN, PATTERNS
+from run_log import counters
+
+try:
+    from unidecode import unidecode  # Optional: transliterates non-Latin scripts
+except ImportError:
+    unidecode = None
+
+try:
+    import pyarrow  # noqa: F401  Optional: compact Arrow-backed strings
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = None
+
+# Rows handled per chunk by the chunked runners
+DEFAULT_CHUNK_SIZE = 5000
+
+# Distinct URLs whose cleaned domain is kept between runs
+DOMAIN_CACHE_SIZE = 100_000
+
+# Distinct names whose normalized form is kept between runs
+NAME_CACHE_SIZE = 100_000
+
+# Letters that NFKD does not split into a base letter plus accents
+TRANSLITERATIONS = str.maketrans({
+    'ß': 'ss', 'ø': 'o', 'Ø': 'o', 'æ': 'ae', 'Æ': 'ae', 'œ': 'oe', 'Œ': 'oe',
+    'đ': 'd', 'Đ': 'd', 'ð': 'd', 'Ð': 'd', 'ł': 'l', 'Ł': 'l', 'þ': 'th', 'Þ': 'th', 'ı': 'i',
+})
+
+# Whitespace and quotes are dropped from names, e.g. "O'Neil" -> "oneil"
+NAME_DROP_RE = re.compile(r"[\s'`\"]+")
+
+
+class JobCancelled(Exception):
+    """Raised between chunks when a job's cancel event is set"""
+
+
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled("Job cancelled")
+
+
+def run_chunked(df, func, chunk_size=DEFAULT_CHUNK_SIZE, on_chunk=None, cancel_event=None, finish_chunk=None):
+    """Apply func to df one chunk at a time and concatenate the results.
+
+    on_chunk(result_chunk, rows_done, total_rows) is called after every chunk,
+    so callers can report progress and append only the new rows; rows_done
+    counts input rows, whatever the number of result rows. Setting
+    cancel_event stops the run with JobCancelled before the next chunk.
+    finish_chunk is applied to each result first, as in stream_file.
+    """
+    if finish_chunk is not None:
+        process = func
+        func = lambda chunk: finish_chunk(process(chunk))
+    total_rows = len(df)
+    if total_rows == 0:
+        return func(df)
+
+    results = []
+    rows_done = 0
+    for start in range(0, total_rows, chunk_size):
+        check_cancelled(cancel_event)
+        chunk = df.iloc[start:start + chunk_size]
+        result_chunk = func(chunk)
+        results.append(result_chunk)
+        rows_done += len(chunk)
+        if on_chunk is not None:
+            on_chunk(result_chunk, rows_done, total_rows)
+
+    return concat_frames(results)
+
+
+def concat_frames(frames):
+    """pd.concat that keeps categorical columns categorical when the chunks' categories differ"""
+    df = pd.concat(frames)
+    for column, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = union_categoricals([frame[column] for frame in frames])
+    return df
+
+
+# Input columns each pipeline needs
+PATTERN_COLUMNS = ['Email', 'First Name', 'Last Name']
+GENERATE_COLUMNS = ['First Name', 'Last Name', 'URL']
+PREDICT_COLUMNS = ['First Name', 'Last Name', 'Email Format', 'Domain']
+TASK_COLUMNS = {
+    'analyze': PATTERN_COLUMNS,
+    'generate': GENERATE_COLUMNS,
+    'predict': PREDICT_COLUMNS,
+}
+
+# Input dtypes: repeated values as categoricals, unique ones as compact strings.
+# Names shrink several times over; URLs only as far as leads share a company,
+# and mostly distinct values gain little over pandas 3's Arrow-backed str
+INPUT_DTYPES = {
+    'First Name': 'category',
+    'Last Name': 'category',
+    'URL': 'category',
+    'Domain': 'category',
+    'Email Format': 'category',
+    'Email': STRING_DTYPE,
+}
+
+# Output column -> result column for each exported result type
+PATTERN_EXPORT = {
+    'Client': 'client',
+    'Domain': 'domain',
+    'Email Format': 'format',  # Now includes domain
+    'Email': 'Email',
+}
+GENERATE_EXPORT = {
+    'Client': 'client',
+    'Domain': 'URL',
+    'Email Format': 'format',  # Now includes domain
+    'Predicted Email': 'predicted_email',
+    'Verified': 'verified',
+    'Confidence': 'confidence',
+}
+CANDIDATE_EXPORT = {
+    'Lead ID': 'lead_id',
+    'Client': 'client',
+    'Domain': 'domain',
+    'Rank': 'rank',
+    'Email': 'email',
+    'Email Format': 'pattern',
+    'Score': 'score',
+    'Verified': 'verified',
+}
+PREDICT_EXPORT = {
+    'First Name': 'First Name',
+    'Last Name': 'Last Name',
+    'Email Format': 'Email Format',
+    'Domain': 'Domain',
+    'Email generated': 'Email generated',
+}
+
+
+# Result column holding each task's email, for optional verification
+EMAIL_COLUMNS = {
+    'generate': 'predicted_email',
+    'candidates': 'email',
+    'predict': 'Email generated',
+}
+
+
+def export_frame(df, columns):
+    """Select and rename result columns for saving, without copying them"""
+    return pd.DataFrame({name: df[source] for name, source in columns.items()}, copy=False)
+
+
+def input_columns(input_path, required_columns):
+    """Map header names of an input file to the required columns they hold, checking the header only.
+
+    Names are matched ignoring surrounding spaces. Raises ValueError if a
+    required column is missing.
+    """
+    mapping = {
+        name: name.strip() for name in file_io.read_header(input_path)
+        if isinstance(name, str) and name.strip() in required_columns
+    }
+    if set(mapping.values()) != set(required_columns):
+        raise ValueError(f"Missing required columns. Required: {', '.join(required_columns)}")
+    return mapping
+
+
+def input_dtypes(mapping):
+    """Compact dtypes for the mapped input columns"""
+    return {name: INPUT_DTYPES[column] for name, column in mapping.items() if INPUT_DTYPES.get(column)}
+
+
+def rename_input(df, mapping):
+    """Rename header names to required column names in place"""
+    df.columns = [mapping[name] for name in df.columns]
+    return df
+
+
+def read_input(input_path, required_columns, nrows=None, on_progress=None, cancel_event=None, cache_dir=None):
+    """Read the required columns of a CSV, Parquet or Feather file, in compact dtypes.
+
+    The header is validated before any rows are parsed. on_progress,
+    cancel_event and cache_dir are passed on to file_io.read_columns.
+    """
+    mapping = input_columns(input_path, required_columns)
+    df = file_io.read_columns(
+        input_path, list(mapping), input_dtypes(mapping), nrows=nrows, cache_dir=cache_dir,
+        on_progress=on_progress, cancel_event=cancel_event
+    )
+    return rename_input(df, mapping)
+
+
+def stream_file(input_path, output_path, func, columns, chunk_size=DEFAULT_CHUNK_SIZE, on_chunk=None,
+                map_chunks=None, required_columns=None, checkpoint=None, cancel_event=None, finish_chunk=None):
+    """Run func over an input file chunk by chunk, appending each exported result to output_path.
+
+    Only one chunk is held in memory at a time, whatever the input size.
+    Input and output can each be CSV, .csv.gz, Parquet or Feather.
+    on_chunk(result_chunk, rows_done) is called after each chunk is written.
+    map_chunks, e.g. ProcessBackend.map, can replace the in-process map of
+    func over the chunks; it must yield results in input order.
+    With required_columns, only those columns are read, as in read_input.
+    finish_chunk(result_chunk) runs in this process on each result before
+    it is written and returns the chunk to write, e.g. for email
+    verification, whose connections stay open across chunks.
+
+    With a checkpoint.JobCheckpoint for output_path, the run resumes from
+    its last checkpoint and saves a new one after every chunk; the
+    checkpoint is removed when the run completes. Setting cancel_event
+    stops the run with JobCancelled after the chunk being written.
+    Returns the number of rows written.
+    """
+    if required_columns is not None:
+        mapping = input_columns(input_path, required_columns)
+    else:
+        mapping = {name: name for name in file_io.read_header(input_path)}
+    rows_read, rows_written = checkpoint.resume_point() if checkpoint is not None else (0, 0)
+
+    # Input rows of the chunks in flight, to know how far the input is done when a result is written
+    chunk_rows = collections.deque()
+
+    def chunks():
+        for chunk in file_io.iter_chunks(input_path, list(mapping), input_dtypes(mapping), chunk_size, rows_read):
+            chunk_rows.append(len(chunk))
+            yield rename_input(chunk, mapping)
+
+    results = map_chunks(chunks()) if map_chunks is not None else map(func, chunks())
+
+    # An empty input still leaves a file with just the header behind
+    with file_io.ChunkWriter(output_path, columns, append_rows=rows_written) as writer:
+        for result_chunk in results:
+            if finish_chunk is not None:
+                result_chunk = finish_chunk(result_chunk)
+            writer.write(export_frame(result_chunk, columns))
+            rows_read += chunk_rows.popleft()
+            if checkpoint is not None:
+                checkpoint.save(rows_read, writer.rows)
+            if on_chunk is not None:
+                on_chunk(result_chunk, writer.rows)
+            check_cancelled(cancel_event)
+    if checkpoint is not None:
+        checkpoint.remove()
+    return writer.rows
+
+
+def as_text(series):
+    """Vectorized str(): missing values become 'nan' like str(float('nan'))"""
+    series = series.astype(object)
+    return series.where(series.notna(), 'nan').astype(str)
+
+
+def as_compact_text(series):
+    """Store a column of mostly unique strings Arrow-backed when pyarrow is available"""
+    return series.astype(STRING_DTYPE) if STRING_DTYPE is not None else series
+
+
+def factorize_text(series):
+    """(codes, distinct values) of a column; missing values get code -1.
+
+    Categorical columns reuse their codes instead of hashing every row.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.cat.remove_unused_categories()
+        return series.cat.codes.to_numpy(), np.asarray(series.cat.categories, dtype=object)
+    codes, uniques = pd.factorize(series)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def client_names(first_names, last_names):
+    """Categorical 'First Last' column, built once per distinct pair of names.
+
+    Like first + ' ' + last, a missing name gives a missing client.
+    """
+    first_codes, first_uniques = factorize_text(first_names)
+    last_codes, last_uniques = factorize_text(last_names)
+    present = (first_codes >= 0) & (last_codes >= 0)
+    pair_keys = np.where(present, first_codes.astype(np.int64) * len(last_uniques) + last_codes, -1)
+    pair_codes, unique_keys = pd.factorize(pair_keys)
+
+    valid = unique_keys >= 0
+    names = np.array(
+        [f"{first_uniques[key // len(last_uniques)]} {last_uniques[key % len(last_uniques)]}"
+         for key in unique_keys[valid]],
+        dtype=object
+    )
+    # Different pairs can join to the same text, e.g. "Mary Ann" + "Lee" and "Mary" + "Ann Lee"
+    name_codes, unique_names = pd.factorize(names)
+    key_codes = np.full(len(unique_keys), -1)
+    key_codes[valid] = name_codes
+    return pd.Series(
+        pd.Categorical.from_codes(key_codes[pair_codes], categories=unique_names.astype(object)),
+        index=first_names.index
+    )
+
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def normalize_name(name):
+    """ASCII, case-folded form of a name for an email username, e.g. "José" -> "jose" """
+    name = name.strip().translate(TRANSLITERATIONS)
+    if unidecode is not None:
+        name = unidecode(name)
+    else:
+        name = unicodedata.normalize('NFKD', name)
+    # Accents split off by NFKD, and anything still not ASCII, are dropped
+    name = name.casefold().encode('ascii', 'ignore').decode('ascii')
+    return NAME_DROP_RE.sub('', name)
+
+
+def normalize_names(series):
+    """normalize_name for a column, computed once per distinct name.
+
+    Missing names, and names with nothing left after normalizing, come back
+    as NaN, so usernames built from them are NaN too.
+    """
+    codes, unique_names = factorize_text(series)
+    before = normalize_name.cache_info()
+    normalized = [normalize_name(str(name)) or np.nan for name in unique_names]
+    after = normalize_name.cache_info()
+
+    counters.add('distinct_names', len(unique_names))
+    counters.add('name_cache_hits', after.hits - before.hits)
+    # Missing values have code -1, which picks the trailing NaN
+    mapping = np.array(normalized + [np.nan], dtype=object)
+    return pd.Series(mapping[codes], index=series.index, dtype=object)
+
+
+def predict_frame(df):
+    """Return a predictor frame with 'client' and 'Email generated' added; input columns are not copied"""
+    df = df.copy(deep=False)
+    df['client'] = client_names(df['First Name'], df['Last Name'])
+
+    usernames = PATTERNS.synthesize(
+        normalize_names(df['First Name']),
+        normalize_names(df['Last Name']),
+        as_text(df['Email Format'])
+    )
+    predicted = usernames.notna()
+    # Failed rows are masked below; the cast keeps both sides one string
+    # dtype, which pandas needs to concatenate an empty frame
+    emails = usernames.astype(str) + '@' + as_text(df['Domain'])
+    df['Email generated'] = as_compact_text(emails.where(predicted, 'Error predicting email'))
+    counters.add('predicted_emails', predicted.sum())
+    counters.add('prediction_errors', (~predicted).sum(), lambda: df.loc[~predicted, 'client'])
+    return df
+
+
+SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*://')
+
+
+@functools.lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def clean_domain(url):
+    """Host part of a URL: lowercase, without scheme, credentials, port or a leading 'www.'"""
+    domain = url.lower().strip()
+    domain = SCHEME_RE.sub('', domain)
+    if domain.startswith('//'):
+        domain = domain[2:]
+    domain = re.split(r'[/?#]', domain, maxsplit=1)[0]
+    domain = domain.rpartition('@')[2]
+    domain = domain.split(':', 1)[0].rstrip('.')
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain
+
+
+def clean_domains(urls):
+    """clean_domain for a column, parsing each distinct URL once; returns a categorical.
+
+    Lead lists repeat the same company URL many times, and the same URLs
+    come back run after run, so parsed domains are also kept in the
+    clean_domain cache for the session.
+    """
+    codes, unique_urls = factorize_text(urls)
+    before = clean_domain.cache_info()
+    domains = [clean_domain(str(url)) for url in unique_urls]
+    if (codes < 0).any():
+        # Missing URLs (code -1, the last entry) read as 'nan', as str() made them
+        domains.append('nan')
+    after = clean_domain.cache_info()
+
+    counters.add('distinct_urls', len(unique_urls))
+    counters.add('url_cache_hits', after.hits - before.hits)
+    # Several URLs can share a domain, and categories must be distinct
+    domain_codes, unique_domains = pd.factorize(np.array(domains, dtype=object))
+    return pd.Series(
+        pd.Categorical.from_codes(domain_codes[codes], categories=unique_domains.astype(object)),
+        index=urls.index
+    )
+
+
+def resolve_pattern(domain, domain_index):
+    """Pattern for a domain, how it was found ('exact', 'fallback' or 'default') and its confidence.
+
+    Falls back to the first related known domain, then to the default
+    pattern. Confidence is NaN for the default, or when the index was built
+    without confidences.
+    """
+    pattern = domain_index.patterns.get(domain)
+    if pattern:
+        return pattern, 'exact', domain_index.confidence.get(domain, np.nan)
+
+    known_domain = domain_index.find(domain)
+    if known_domain is not None and domain_index.patterns[known_domain]:
+        return domain_index.patterns[known_domain], 'fallback', domain_index.confidence.get(known_domain, np.nan)
+
+    return DEFAULT_PATTERN, 'default', np.nan
+
+
+def lookup_known(known_people, first_names, last_names, domains):
+    """Position in known_people of each row's person, -1 where unknown or there is no index"""
+    if known_people is None or not len(known_people):
+        return np.full(len(first_names), -1, dtype=np.intp)
+    return known_people.lookup(person_keys(first_names, last_names, domains))
+
+
+def generate_frame(df, email_patterns, domain_index=None, known_people=None):
+    """Return a copy of a prediction frame with generated emails added.
+
+    New columns are 'client', 'predicted_email', 'format', 'verified' and
+    'confidence', the consensus confidence of the pattern used.
+
+    domain_index should be the DomainIndex built when the patterns were
+    stored; one is built here if it is not supplied. Leads found in
+    known_people, a KnownPeople index, get their known email with
+    'verified' set; emails are only predicted for the rest.
+    """
+    if domain_index is None:
+        domain_index = DomainIndex(email_patterns)
+
+    df = df.copy(deep=False)
+    df['client'] = client_names(df['First Name'], df['Last Name'])
+
+    # Resolve each distinct domain once, then broadcast back to the rows
+    domains = clean_domains(df['URL'])
+    codes = domains.cat.codes.to_numpy()
+    unique_domains = np.asarray(domains.cat.categories, dtype=object)
+    resolved = [resolve_pattern(d, domain_index) for d in unique_domains]
+    domain_patterns = np.array([pattern for pattern, _, _ in resolved], dtype=object)
+    domain_sources = np.array([source for _, source, _ in resolved], dtype=object)
+    domain_confidence = np.array([confidence for _, _, confidence in resolved], dtype=np.float64)
+    row_domains = pd.Series(unique_domains[codes], index=df.index, dtype=object)
+
+    first_names = normalize_names(df['First Name'])
+    last_names = normalize_names(df['Last Name'])
+    known = lookup_known(known_people, first_names, last_names, row_domains)
+    verified = known >= 0
+    predict = ~verified
+    row_sources = np.where(verified, 'known', domain_sources[codes])
+
+    usernames = PATTERNS.synthesize(
+        first_names[predict],
+        last_names[predict],
+        pd.Series(domain_patterns[codes[predict]], index=df.index[predict], dtype=object)
+    )
+    generated = verified.copy()
+    generated[predict] = usernames.notna().to_numpy()
+    emails = np.empty(len(df), dtype=object)
+    emails[predict] = (usernames + '@' + row_domains[predict]).where(usernames.notna(), "Error generating email")
+    if verified.any():
+        emails[verified] = known_people.emails[known[verified]]
+    df['predicted_email'] = as_compact_text(pd.Series(emails, index=df.index))
+    df['verified'] = verified
+    # Share of its domain's analyzed emails the pattern covers; known emails are certain
+    df['confidence'] = np.where(verified, 1.0, domain_confidence[codes]).round(4)
+
+    # One format per distinct domain, plus 'error' for rows that failed
+    formats = np.append(domain_patterns + '@' + unique_domains, "error").astype(object)
+    format_codes = np.where(generated, codes, len(unique_domains))
+    if verified.any():
+        # Known people keep the pattern their own email was analyzed as
+        known_formats = known_people.patterns[known[verified]] + '@' + unique_domains[codes[verified]]
+        format_codes[verified] = len(formats) + np.arange(verified.sum())
+        category_codes, formats = pd.factorize(np.append(formats, known_formats))
+        format_codes = category_codes[format_codes]
+    df['format'] = pd.Categorical.from_codes(format_codes, categories=formats)
+
+    counters.add('generated_emails', generated.sum())
+    counters.add('known_emails', verified.sum())
+    counters.add('fallback_domain_matches', (row_sources == 'fallback').sum(),
+                 lambda: unique_domains[domain_sources == 'fallback'])
+    counters.add('default_pattern_rows', (row_sources == 'default').sum(),
+                 lambda: unique_domains[domain_sources == 'default'])
+    low_confidence = (row_sources == 'exact') & (domain_confidence[codes] < MIN_FALLBACK_CONFIDENCE)
+    counters.add('low_confidence_rows', low_confidence.sum(),
+                 lambda: unique_domains[(domain_sources == 'exact') & (domain_confidence < MIN_FALLBACK_CONFIDENCE)])
+    counters.add('generation_errors', (~generated).sum(), lambda: df.loc[~generated, 'client'])
+    return df
+
+
+# Extra candidates ranked per domain, to make up for ones dropped as unbuildable or duplicate
+CANDIDATE_SPARE = 2
+
+
+def candidates_frame(df, ranking, k=DEFAULT_TOP_K, domain_index=None, known_people=None):
+    """Long frame of the top k candidate emails for each lead of a prediction frame.
+
+    Columns are 'lead_id' (the lead's row label in df, i.e. its row in the
+    input file), 'client', 'domain', 'rank' (from 1), 'email', 'pattern',
+    'score' and 'verified'. Candidates are ranked once per distinct domain
+    by the PatternRanking and expanded to the leads with array indexing;
+    usernames are built once per pattern, as in generate_frame. Candidates
+    whose username cannot be built, or that repeat a better-ranked email of
+    the same lead, are dropped and the rest re-ranked. A lead found in
+    known_people gets just its known email, verified, with score 1.
+    """
+    domains = clean_domains(df['URL'])
+    codes = domains.cat.codes.to_numpy()
+    unique_domains = np.asarray(domains.cat.categories, dtype=object)
+    candidates = ranking.top_k(unique_domains, k + CANDIDATE_SPARE, domain_index)
+
+    first_names = normalize_names(df['First Name'])
+    last_names = normalize_names(df['Last Name'])
+    known = lookup_known(known_people, first_names, last_names, pd.Series(unique_domains[codes], index=df.index))
+    verified = known >= 0
+    known_patterns = known_people.patterns[known[verified]] if verified.any() else []
+    # Known emails may use patterns the ranking has no counts for
+    pattern_categories = list(dict.fromkeys([*ranking.patterns, *known_patterns]))
+
+    # Candidate rows are grouped by domain; lead i gets its domain's block of them, unless it is known
+    counts = np.bincount(candidates['domain_code'].to_numpy(), minlength=len(unique_domains))
+    starts = np.cumsum(counts) - counts
+    per_lead = np.where(verified, 0, counts[codes])
+    lead_rows = np.repeat(np.arange(len(df)), per_lead)
+    offsets = np.arange(len(lead_rows)) - np.repeat(np.cumsum(per_lead) - per_lead, per_lead)
+    candidate_rows = np.repeat(starts[codes], per_lead) + offsets
+
+    patterns = pd.Series(candidates['pattern'].to_numpy()[candidate_rows], dtype=object)
+    usernames = PATTERNS.synthesize(
+        pd.Series(first_names.to_numpy()[lead_rows], dtype=object),
+        pd.Series(last_names.to_numpy()[lead_rows], dtype=object),
+        patterns
+    )
+    clients = client_names(df['First Name'], df['Last Name'])
+    lead_domains = codes[lead_rows]
+    result = pd.DataFrame({
+        'lead_row': lead_rows,
+        'lead_id': df.index.to_numpy()[lead_rows],
+        'client': clients.array.take(lead_rows),
+        'domain': pd.Categorical.from_codes(lead_domains, categories=unique_domains),
+        'email': (usernames + '@' + unique_domains[lead_domains]).to_numpy(dtype=object),
+        'pattern': pd.Categorical(patterns, categories=pattern_categories),
+        'score': candidates['score'].to_numpy()[candidate_rows].round(4),
+        'verified': False,
+    })
+    result = result[usernames.notna().to_numpy()].drop_duplicates(['lead_id', 'email'])
+    rank = result.groupby('lead_id', sort=False).cumcount().to_numpy() + 1
+    result.insert(4, 'rank', rank.astype(np.int16))
+    result = result[rank <= k]
+
+    if verified.any():
+        known_rows = np.flatnonzero(verified)
+        known_result = pd.DataFrame({
+            'lead_row': known_rows,
+            'lead_id': df.index.to_numpy()[known_rows],
+            'client': clients.array.take(known_rows),
+            'domain': pd.Categorical.from_codes(codes[known_rows], categories=unique_domains),
+            'rank': np.ones(len(known_rows), dtype=np.int16),
+            'email': known_people.emails[known[verified]],
+            'pattern': pd.Categorical(known_patterns, categories=pattern_categories),
+            'score': 1.0,
+            'verified': True,
+        })
+        # Back in lead order
+        result = pd.concat([result, known_result]).sort_values('lead_row', kind='stable')
+    result = result.drop(columns='lead_row').reset_index(drop=True)
+    result['email'] = as_compact_text(result['email'])
+
+    counters.add('candidate_emails', len(result))
+    counters.add('known_emails', verified.sum())
+    counters.add('leads_without_candidates', len(df) - result['lead_id'].nunique())
+    return result
+
+
+def split_emails(emails):
+    """Split an Email column into (username, domain); rows without '@' get NaN"""
+    parts = as_text(emails).str.lower().str.split('@')
+    has_domain = parts.str.len() > 1
+    username = parts.str[0].where(has_domain)
+    domain = parts.str[1].where(has_domain)
+    return username, domain
+
+
+def classify_frame(df):
+    """Vectorized pattern detection for a pattern frame.
+
+    Returns a frame with 'domain' and 'format' columns, where format is
+    '<pattern>@<domain>', or domain None and format 'invalid' for rows
+    whose email or names cannot be analyzed. 'person_key' is the
+    known_people key of each valid row with both names.
+    """
+    username, domain = split_emails(df['Email'])
+    first_name = normalize_names(df['First Name'])
+    last_name = normalize_names(df['Last Name'])
+    keys = person_keys(first_name, last_name, domain.astype(object))
+    # Missing names are checked like empty ones
+    first_name = first_name.fillna('')
+    last_name = last_name.fillna('')
+
+    # Registered templates in priority order. An empty first or last name
+    # made the original chain fail on name[0] at the first template needing
+    # that letter, and the registry turns those rows invalid at the same point.
+    format_type = PATTERNS.detect(username, first_name, last_name)
+
+    # Usernames the exact templates missed are aligned token by token against the names
+    residual = format_type.isna()
+    if residual.any():
+        inferred = PATTERNS.infer(username[residual], first_name[residual], last_name[residual])
+        format_type[residual] = inferred
+        counters.add('inferred_patterns', inferred.notna().sum(),
+                     lambda: (f"{email} -> {pattern}" for email, pattern
+                              in zip(df.loc[inferred.index, 'Email'], inferred) if pattern is not None))
+
+    # Additional pattern checks for whatever alignment could not place
+    residual = format_type.isna()
+    if residual.any():
+        starts_with_first = pd.Series(
+            [u.startswith(f) for u, f in zip(username[residual], first_name[residual])],
+            index=username[residual].index,
+            dtype=bool
+        )
+        format_type[residual & starts_with_first.reindex(df.index, fill_value=False)] = DEFAULT_PATTERN
+        format_type[format_type.isna() & username.str.startswith('d', na=False)] = 'LastNameFirstLetterFirstName'
+
+        unrecognized = format_type.isna()
+        counters.add('unrecognized_patterns', unrecognized.sum(), lambda: df.loc[unrecognized, 'Email'])
+        format_type[unrecognized] = DEFAULT_PATTERN
+
+    invalid = format_type == 'invalid'
+    counters.add('analyzed_emails', (~invalid).sum())
+    counters.add('invalid_emails', invalid.sum(), lambda: df.loc[invalid, 'Email'])
+
+    result = pd.DataFrame(index=df.index)
+    result['domain'] = domain.astype(object).where(~invalid, None).astype('category')
+    result['format'] = (format_type + '@' + domain.astype(object).fillna('')).where(~invalid, 'invalid').astype('category')
+    result['person_key'] = as_compact_text(keys.where(~invalid))
+    return result
+
+
+def analyze_frame(df):
+    """Return a pattern frame with 'client', 'domain', 'format' and 'person_key' added; input columns are not copied"""
+    df = df.copy(deep=False)
+    df['client'] = client_names(df['First Name'], df['Last Name'])
+    result = classify_frame(df)
+    df['domain'] = result['domain']
+    df['format'] = result['format']
+    df['person_key'] = result['person_key']
+    return df
@@ -0,0 +1,350 @@
+"""Optional bulk verification of generated emails against their domains' mail servers.
+
+Each distinct address is checked with an SMTP RCPT probe; no mail is sent.
+Probes run on an asyncio event loop in a background thread:
+
+- MX records are looked up once per domain and cached, including misses
+- each domain has a small pool of SMTP connections, reused across many
+  RCPT probes, with at most connections_per_domain open at a time
+- probes to one domain are spaced to at most probes_per_second
+- a domain that accepts a made-up address is reported as catch-all
+
+MX lookups use dnspython when it is installed, else each domain's own
+address record (the implicit MX of RFC 5321). For tests, mx_hosts maps
+domains straight to mail hosts, nameservers points dnspython at a stand-in
+DNS server and port at a stand-in SMTP server.
+"""
+import asyncio
+import re
+import socket
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from run_log import counters, logger
+
+try:
+    import dns.asyncresolver  # Optional: real MX lookups
+    import dns.exception
+    import dns.resolver
+except ImportError:
+    dns = None
+
+DEFAULT_MAIL_FROM = 'verify@localhost'
+DEFAULT_TIMEOUT = 10.0  # seconds per connect or command
+CONNECTIONS_PER_DOMAIN = 2
+PROBES_PER_SECOND = 5.0  # per domain
+MAX_CONCURRENCY = 100  # probes in flight over all domains
+RCPT_PER_TRANSACTION = 50  # RSET and a new MAIL FROM after this many probes
+
+# Verification results
+VALID = 'valid'
+INVALID = 'invalid'
+CATCH_ALL = 'catch_all'
+UNKNOWN = 'unknown'  # temporary failure, timeout or connection error
+NO_MAIL_SERVER = 'no_mail_server'
+BAD_SYNTAX = 'bad_syntax'
+UNCHECKED = 'unchecked'  # verification was cancelled first
+STATUSES = [VALID, INVALID, CATCH_ALL, UNKNOWN, NO_MAIL_SERVER, BAD_SYNTAX, UNCHECKED]
+
+# Result column added by verify_frame, and its export mapping
+VERIFICATION_COLUMN = 'verification'
+VERIFICATION_EXPORT = {'Verification': VERIFICATION_COLUMN}
+
+EMAIL_RE = re.compile(r'^[^@\s<>]+@[a-z0-9-]+(\.[a-z0-9-]+)+$', re.IGNORECASE)
+
+
+class SMTPError(Exception):
+    """Unexpected reply while opening an SMTP session or starting a new transaction on it"""
+
+
+class SMTPConnection:
+    """One SMTP session used for a series of RCPT probes"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.probes = 0
+
+    async def open(self, helo_host, mail_from):
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        code, message = await self.reply()
+        if code != 220:
+            raise SMTPError(f"{self.host} greeted with {code} {message}")
+        code, message = await self.command(f"EHLO {helo_host}")
+        if code != 250:
+            code, message = await self.command(f"HELO {helo_host}")
+            if code != 250:
+                raise SMTPError(f"{self.host} refused HELO: {code} {message}")
+        self.mail_from = mail_from
+        await self.start_transaction()
+
+    async def start_transaction(self):
+        code, message = await self.command(f"MAIL FROM:<{self.mail_from}>")
+        if code != 250:
+            raise SMTPError(f"{self.host} refused MAIL FROM: {code} {message}")
+        self.probes = 0
+
+    async def reply(self):
+        """(code, text) of one possibly multi-line reply"""
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionError(f"{self.host} closed the connection")
+            line = line.decode('utf-8', 'replace').rstrip('\r\n')
+            lines.append(line[4:])
+            if line[3:4] != '-':
+                return int(line[:3]), ' '.join(lines)
+
+    async def command(self, line):
+        self.writer.write(line.encode('utf-8') + b'\r\n')
+        await asyncio.wait_for(self.writer.drain(), self.timeout)
+        return await self.reply()
+
+    async def probe(self, address):
+        if self.probes >= RCPT_PER_TRANSACTION:
+            await self.command("RSET")
+            await self.start_transaction()
+        self.probes += 1
+        return await self.command(f"RCPT TO:<{address}>")
+
+    async def close(self):
+        if self.writer is None:
+            return
+        try:
+            await self.command("QUIT")
+        except (OSError, asyncio.TimeoutError, ValueError):
+            pass
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+        self.writer = None
+
+
+class DomainPool:
+    """Reusable SMTP connections to one domain's mail hosts, with its concurrency and rate limits"""
+
+    def __init__(self, verifier, domain, hosts):
+        self.verifier = verifier
+        self.domain = domain
+        self.hosts = hosts
+        self.slots = asyncio.Semaphore(verifier.connections_per_domain)
+        self.idle = []
+        self.interval = 1 / verifier.probes_per_second if verifier.probes_per_second else 0
+        self.next_probe = 0.0
+
+    async def wait_turn(self):
+        """Space probes to this domain at least interval seconds apart"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self.next_probe)
+        self.next_probe = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def connect(self):
+        """A new session with the first mail host, in MX order, that accepts one"""
+        error = None
+        for host in self.hosts:
+            connection = SMTPConnection(host, self.verifier.port, self.verifier.timeout)
+            try:
+                await connection.open(self.verifier.helo_host, self.verifier.mail_from)
+                return connection
+            except (OSError, asyncio.TimeoutError, SMTPError, ValueError) as e:
+                error = e
+                await connection.close()
+        raise ConnectionError(f"No mail host of {self.domain} accepted a session: {error}")
+
+    async def probe(self, address):
+        """(code, message) of RCPT TO for address"""
+        async with self.slots:
+            await self.wait_turn()
+            # An idle connection may have been dropped by the server; retry once on a new one
+            for attempt in range(2):
+                reused = bool(self.idle)
+                connection = self.idle.pop() if reused else await self.connect()
+                try:
+                    code, message = await connection.probe(address)
+                except (OSError, asyncio.TimeoutError, SMTPError, ValueError):
+                    await connection.close()
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                if code == 421:  # server is closing the session
+                    await connection.close()
+                else:
+                    self.idle.append(connection)
+                return code, message
+
+    async def close(self):
+        while self.idle:
+            await self.idle.pop().close()
+
+
+class EmailVerifier:
+    """Verifies batches of addresses; caches and connection pools last until close()"""
+
+    def __init__(self, mail_from=DEFAULT_MAIL_FROM, helo_host=None, port=25, timeout=DEFAULT_TIMEOUT,
+                 connections_per_domain=CONNECTIONS_PER_DOMAIN, probes_per_second=PROBES_PER_SECOND,
+                 max_concurrency=MAX_CONCURRENCY, mx_hosts=None, nameservers=None, check_catch_all=True):
+        self.mail_from = mail_from
+        self.helo_host = helo_host or socket.getfqdn()
+        self.port = port
+        self.timeout = timeout
+        self.connections_per_domain = connections_per_domain
+        self.probes_per_second = probes_per_second
+        self.max_concurrency = max_concurrency
+        self.static_mx = {domain.lower(): list(hosts) for domain, hosts in (mx_hosts or {}).items()}
+        self.nameservers = nameservers  # [(address, port)] for dnspython
+        self.check_catch_all = check_catch_all
+
+        self.results = {}  # address -> status, for the verifier's lifetime
+        self.mx_cache = {}  # domain -> task resolving to its mail hosts ([] if none)
+        self.pools = {}
+        self.catch_all = {}  # domain -> task resolving to True if it accepts any address
+        if dns is None and not self.static_mx:
+            logger.info("dnspython not installed; each domain's address record is used as its mail host")
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def verify(self, emails, on_progress=None, cancel_event=None):
+        """Status of each address in emails (a list), checking each distinct one once.
+
+        on_progress(done, total) reports distinct addresses checked; once
+        cancel_event is set, the rest come back as UNCHECKED.
+        """
+        pending = list(dict.fromkeys(email for email in emails if email not in self.results))
+        if pending:
+            future = asyncio.run_coroutine_threadsafe(self.verify_all(pending, on_progress, cancel_event), self.loop)
+            self.results.update(future.result())
+        return [self.results.get(email, UNCHECKED) for email in emails]
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.close_pools(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def close_pools(self):
+        for pool in self.pools.values():
+            await pool.close()
+        self.pools.clear()
+
+    async def verify_all(self, emails, on_progress=None, cancel_event=None):
+        limit = asyncio.Semaphore(self.max_concurrency)
+        done = 0
+
+        async def verify_one(email):
+            nonlocal done
+            async with limit:
+                if cancel_event is not None and cancel_event.is_set():
+                    return email, UNCHECKED
+                status = await self.check(email)
+            done += 1
+            if on_progress is not None:
+                on_progress(done, len(emails))
+            return email, status
+
+        results = await asyncio.gather(*(verify_one(email) for email in emails))
+        # Unchecked addresses are left out so a later call checks them
+        return {email: status for email, status in results if status != UNCHECKED}
+
+    async def check(self, email):
+        if not isinstance(email, str) or not EMAIL_RE.match(email):
+            return BAD_SYNTAX
+        domain = email.rpartition('@')[2].lower()
+        hosts = await self.cached(self.mx_cache, domain, self.lookup_mx)
+        if not hosts:
+            return NO_MAIL_SERVER
+
+        try:
+            code, message = await self.pool(domain, hosts).probe(email)
+        except (OSError, asyncio.TimeoutError, SMTPError, ValueError) as e:
+            logger.debug(f"Could not verify {email}: {str(e)}")
+            return UNKNOWN
+        if code in (250, 251):
+            if self.check_catch_all and await self.cached(self.catch_all, domain, self.accepts_anything):
+                return CATCH_ALL
+            return VALID
+        if 500 <= code < 600:
+            return INVALID
+        return UNKNOWN
+
+    def pool(self, domain, hosts):
+        if domain not in self.pools:
+            self.pools[domain] = DomainPool(self, domain, hosts)
+        return self.pools[domain]
+
+    async def cached(self, cache, domain, func):
+        """Await func(domain) once per domain, sharing the result between concurrent callers"""
+        if domain not in cache:
+            cache[domain] = asyncio.ensure_future(func(domain))
+        return await cache[domain]
+
+    async def accepts_anything(self, domain):
+        """True if the domain accepts an address that cannot exist"""
+        address = f"no-such-user-{uuid.uuid4().hex[:12]}@{domain}"
+        try:
+            code, _ = await self.pools[domain].probe(address)
+        except (OSError, asyncio.TimeoutError, SMTPError, ValueError):
+            return False
+        return code in (250, 251)
+
+    async def lookup_mx(self, domain):
+        """Mail hosts of a domain in preference order; [] if it has none"""
+        if domain in self.static_mx:
+            return self.static_mx[domain]
+        if dns is not None:
+            try:
+                resolver = dns.asyncresolver.Resolver(configure=not self.nameservers)
+                if self.nameservers:
+                    resolver.nameservers = [address for address, _ in self.nameservers]
+                    resolver.port = self.nameservers[0][1]
+                resolver.lifetime = self.timeout
+                answer = await resolver.resolve(domain, 'MX')
+                records = sorted(answer, key=lambda record: record.preference)
+                # A null MX (".") says the domain takes no mail
+                return [host for host in (str(r.exchange).rstrip('.') for r in records) if host]
+            except dns.resolver.NoAnswer:
+                pass  # no MX record: fall back to the address record
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoNameservers):
+                return []
+            except dns.exception.DNSException as e:
+                logger.debug(f"MX lookup for {domain} failed: {str(e)}")
+                return []
+
+        try:
+            await asyncio.wait_for(asyncio.get_running_loop().getaddrinfo(domain, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            return []
+        return [domain]
+
+
+def verify_frame(df, email_column, verifier, on_progress=None, cancel_event=None):
+    """Add a categorical 'verification' column with the status of each row's email"""
+    codes, unique_emails = pd.factorize(df[email_column].astype(object))
+    statuses = np.array(verifier.verify(list(unique_emails), on_progress, cancel_event) + [BAD_SYNTAX], dtype=object)
+    df = df.copy(deep=False)
+    # Missing emails have code -1, which picks the trailing BAD_SYNTAX
+    df[VERIFICATION_COLUMN] = pd.Categorical(statuses[codes], categories=STATUSES)
+    for status in (VALID, INVALID, CATCH_ALL, UNKNOWN, NO_MAIL_SERVER):
+        counters.add(f'verified_{status}', int((df[VERIFICATION_COLUMN] == status).sum()))
+    return df
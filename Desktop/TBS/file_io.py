@@ -0,0 +1,372 @@
+"""Reading and writing data files by extension: CSV (optionally gzipped), Parquet and Feather.
+
+Only the requested columns are read from any format. Parquet and Feather
+need pyarrow; CSV works with pandas alone, and is parsed by pyarrow's
+multithreaded reader when it is installed. CSV files read in full can also
+be cached as Feather (pass a cache_dir), so loading the same unchanged file
+again skips parsing.
+
+Full reads report progress (bytes of CSV, rows of Parquet) and can be
+cancelled between batches from another thread.
+"""
+import gzip
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+from run_log import logger
+
+# Cached Feather copies of CSV inputs, next to the application
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'input_cache')
+MAX_CACHED_FILES = 5
+MAX_CACHE_BYTES = 2 * 1024 ** 3  # total size of the cache; larger inputs are not cached
+
+INPUT_EXTENSIONS = ['.csv', '.csv.gz', '.parquet', '.feather']
+OUTPUT_EXTENSIONS = ['.csv', '.csv.gz', '.parquet', '.feather']
+
+# Granularity of progress reports and cancellation checks
+CSV_BLOCK_SIZE = 4 * 1024 * 1024  # bytes per pyarrow block
+CSV_CHUNK_ROWS = 100_000  # rows per chunk when pandas parses
+PARQUET_BATCH_ROWS = 65_536
+
+
+class LoadCancelled(Exception):
+    """Raised by a read when its cancel event is set"""
+
+
+class CountingReader(io.RawIOBase):
+    """Wraps a binary file and counts the bytes read from it"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        self.bytes_read += count or 0
+        return count
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def file_format(path):
+    """'parquet', 'feather' or 'csv' (the default, including .csv.gz)"""
+    lower = str(path).lower()
+    if lower.endswith('.parquet'):
+        return 'parquet'
+    if lower.endswith('.feather'):
+        return 'feather'
+    return 'csv'
+
+
+def require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("Parquet and Feather files need pyarrow (pip install pyarrow)")
+
+
+def read_header(path):
+    """Column names of a data file, without reading any rows"""
+    fmt = file_format(path)
+    if fmt == 'csv':
+        return list(pd.read_csv(path, nrows=0).columns)
+
+    require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if fmt == 'parquet':
+        return pq.read_schema(path).names
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def apply_dtypes(df, dtype):
+    """Cast columns to the requested loader dtypes where they differ"""
+    changed = {name: kind for name, kind in dtype.items() if name in df.columns and str(df[name].dtype) != kind}
+    return df.astype(changed) if changed else df
+
+
+def arrow_to_frame(table, dtype):
+    """Convert an Arrow table, with categorical columns dictionary-encoded before conversion"""
+    import pyarrow.compute as pc
+    for name, kind in dtype.items():
+        if kind == 'category' and name in table.column_names:
+            index = table.column_names.index(name)
+            table = table.set_column(index, name, pc.dictionary_encode(table.column(name)))
+    return apply_dtypes(table.to_pandas(), dtype)
+
+
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise LoadCancelled("Loading cancelled")
+
+
+def report(on_progress, done, total):
+    if on_progress is not None:
+        on_progress(done, total)
+
+
+def read_columns(path, columns, dtype=None, nrows=None, cache_dir=None,
+                 on_progress=None, cancel_event=None):
+    """Read the given columns of a data file.
+
+    With a cache_dir, e.g. DEFAULT_CACHE_DIR, full CSV reads go through the
+    Feather cache there. on_progress(done, total) is called as a full read advances; cancel_event
+    (a threading.Event) stops it with LoadCancelled.
+    """
+    dtype = dtype or {}
+    fmt = file_format(path)
+    if fmt == 'csv':
+        if nrows is not None:
+            return pd.read_csv(path, usecols=columns, dtype=dtype, nrows=nrows)
+        if cache_dir is not None:
+            return read_csv_cached(path, columns, dtype, cache_dir, on_progress, cancel_event)
+        return read_csv_progress(path, columns, dtype, on_progress, cancel_event)
+
+    if nrows is not None:
+        first = next(iter_chunks(path, columns, dtype, max(nrows, 1)), None)
+        if first is None:
+            return apply_dtypes(pd.DataFrame({name: pd.Series(dtype=object) for name in columns}), dtype)
+        return first.iloc[:nrows]
+
+    require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if fmt == 'parquet':
+        parquet_file = pq.ParquetFile(path)
+        total = parquet_file.metadata.num_rows
+        batches = []
+        rows = 0
+        for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_ROWS, columns=columns):
+            check_cancelled(cancel_event)
+            batches.append(batch)
+            rows += batch.num_rows
+            report(on_progress, rows, total)
+        schema = pa.schema([parquet_file.schema_arrow.field(name) for name in columns])
+        table = pa.Table.from_batches(batches, schema=schema)
+    else:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all().select(columns)
+        report(on_progress, table.num_rows, table.num_rows)
+    return arrow_to_frame(table, dtype)
+
+
+def read_csv_progress(path, columns, dtype, on_progress=None, cancel_event=None):
+    """Parse a CSV (or .csv.gz) in blocks, reporting bytes read and checking for cancellation"""
+    total = os.path.getsize(path)
+    counter = CountingReader(open(path, 'rb'))
+    buffered = io.BufferedReader(counter)
+    source = gzip.GzipFile(fileobj=buffered) if str(path).lower().endswith('.gz') else buffered
+
+    with buffered, source:
+        try:
+            require_pyarrow()
+        except ImportError:
+            # pandas alone: parse in row chunks and convert dtypes at the end
+            text_dtype = {name: object for name in columns}
+            chunks = []
+            for chunk in pd.read_csv(source, usecols=columns, dtype=text_dtype, chunksize=CSV_CHUNK_ROWS):
+                check_cancelled(cancel_event)
+                chunks.append(chunk)
+                report(on_progress, counter.bytes_read, total)
+            if not chunks:
+                return pd.read_csv(path, usecols=columns, dtype=dtype, nrows=0)
+            return apply_dtypes(pd.concat(chunks, ignore_index=True), dtype)
+
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+            # Quoted cells may span lines, as pandas allows
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types={name: pa.string() for name in columns},
+                strings_can_be_null=True  # empty fields are missing, as in pandas
+            )
+        )
+        batches = []
+        for batch in reader:
+            check_cancelled(cancel_event)
+            batches.append(batch)
+            report(on_progress, counter.bytes_read, total)
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+    return arrow_to_frame(table, dtype)
+
+
+def cache_path(path, columns, dtype, cache_dir):
+    """Cache file for this exact file version and column selection"""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{sorted(columns)}|{sorted(dtype.items())}"
+    return os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.feather')
+
+
+def read_csv_cached(path, columns, dtype, cache_dir, on_progress=None, cancel_event=None):
+    """read_csv_progress through a Feather cache; without pyarrow nothing is cached"""
+    try:
+        require_pyarrow()
+    except ImportError:
+        return read_csv_progress(path, columns, dtype, on_progress, cancel_event)
+
+    cached = cache_path(path, columns, dtype, cache_dir)
+    if os.path.exists(cached):
+        try:
+            df = pd.read_feather(cached)
+            logger.info(f"Loaded {os.path.basename(path)} from the input cache")
+            report(on_progress, 1, 1)
+            return df
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable input cache {cached}: {str(e)}")
+
+    df = read_csv_progress(path, columns, dtype, on_progress, cancel_event)
+    if os.path.getsize(path) > MAX_CACHE_BYTES:
+        return df
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        partial = cached + '.partial'
+        df.to_feather(partial)
+        os.replace(partial, cached)
+        prune_cache(cache_dir)
+    except Exception as e:
+        logger.warning(f"Could not cache {os.path.basename(path)}: {str(e)}")
+    return df
+
+
+def prune_cache(cache_dir, keep=MAX_CACHED_FILES, max_bytes=MAX_CACHE_BYTES):
+    """Delete the oldest cache files beyond keep files or max_bytes in total"""
+    files = sorted(
+        (os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.feather')),
+        key=os.path.getmtime,
+        reverse=True
+    )
+    total = 0
+    for rank, cached in enumerate(files):
+        total += os.path.getsize(cached)
+        if rank >= keep or total > max_bytes:
+            os.remove(cached)
+
+
+def iter_chunks(path, columns, dtype=None, chunk_size=5000, skip_rows=0):
+    """Yield the given columns of a data file chunk_size rows at a time, after the first skip_rows rows"""
+    dtype = dtype or {}
+    fmt = file_format(path)
+    if fmt == 'csv':
+        skiprows = range(1, skip_rows + 1) if skip_rows else None
+        for chunk in pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunk_size, skiprows=skiprows):
+            if skip_rows:
+                chunk.index += skip_rows
+            yield chunk
+        return
+
+    require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    start = skip_rows
+    if fmt == 'parquet':
+        batches = skip_batches(pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns), skip_rows)
+    else:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all().select(columns).slice(skip_rows)
+        batches = table.to_batches(max_chunksize=chunk_size)
+
+    for batch in batches:
+        chunk = apply_dtypes(batch.to_pandas(), dtype)
+        # Continue the row numbering across chunks, like read_csv does
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def skip_batches(batches, skip_rows):
+    """Drop the first skip_rows rows of a stream of record batches"""
+    for batch in batches:
+        if skip_rows >= batch.num_rows:
+            skip_rows -= batch.num_rows
+            continue
+        yield batch.slice(skip_rows)
+        skip_rows = 0
+
+
+def write_frame(df, path):
+    """Write a result frame in the format given by the file extension"""
+    fmt = file_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        require_pyarrow()
+        df.to_parquet(path, index=False)
+    else:
+        require_pyarrow()
+        df.reset_index(drop=True).to_feather(path)
+
+
+def text_values(column):
+    """A column as str objects, with missing values as None, for a string Arrow schema"""
+    if pd.api.types.is_numeric_dtype(column.dtype):
+        column = column.astype(str).where(column.notna())
+    return column.astype(object).where(column.notna(), None)
+
+
+class ChunkWriter:
+    """Appends result chunks with fixed text columns to one output file.
+
+    CSV (and .csv.gz) chunks are appended as they come. Parquet and Feather
+    chunks are written as row groups / record batches of one file, so the
+    whole result is never held in memory. The file is complete, with its
+    header, even when no chunk was written.
+
+    append_rows resumes a CSV output that already holds that many rows:
+    chunks are appended after them, without a new header.
+    """
+
+    def __init__(self, path, columns, append_rows=0):
+        self.path = path
+        self.columns = list(columns)
+        self.format = file_format(path)
+        self.rows = append_rows
+        self.writer = None
+
+        if append_rows and self.format != 'csv':
+            raise ValueError("Only CSV outputs can be appended to")
+        if self.format != 'csv':
+            require_pyarrow()
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self.schema = pa.schema([(name, pa.string()) for name in self.columns])
+            if self.format == 'parquet':
+                self.writer = pq.ParquetWriter(path, self.schema)
+            else:
+                self.writer = pa.ipc.new_file(path, self.schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        else:
+            import pyarrow as pa
+            text = {name: text_values(df[name]) for name in self.columns}
+            table = pa.Table.from_pydict(text, schema=self.schema)
+            self.writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self.format == 'csv':
+            if self.rows == 0:
+                pd.DataFrame(columns=self.columns).to_csv(self.path, index=False)
+        elif self.writer is not None:
+            self.writer.close()
+            self.writer = None
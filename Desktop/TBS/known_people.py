@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+# Joins the parts of a person key; never left in a normalized name or a domain
+KEY_SEPARATOR = '\x1f'
+
+
+def person_keys(first_names, last_names, domains):
+    """'first<sep>last<sep>domain' key of each row, from normalized names and lowercase domains.
+
+    Rows missing any part get NaN, so they are never stored or matched.
+    """
+    return first_names + KEY_SEPARATOR + last_names + KEY_SEPARATOR + domains
+
+
+class KnownPeople:
+    """Hashed index of people whose email was seen in an analyzed pattern file.
+
+    Built from PatternStore.load_known() rows of (person key, email,
+    pattern). lookup() joins a whole column of keys against the index in
+    one hash-table pass, so generation can take the known email of a lead
+    instead of predicting one.
+    """
+
+    def __init__(self, known_rows):
+        known = pd.DataFrame(list(known_rows), columns=['person_key', 'email', 'pattern'])
+        # Keys are the store's primary key, so the index is unique. Index and
+        # lookups both stay object dtype; mixing in pandas' str dtype is far slower
+        self.keys = pd.Index(known['person_key'].to_numpy(dtype=object), dtype=object)
+        self.emails = known['email'].to_numpy(dtype=object)
+        self.patterns = known['pattern'].to_numpy(dtype=object)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, keys):
+        """Position in the index of each key, or -1 for people not known"""
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.intp)
+        return self.keys.get_indexer(np.asarray(keys, dtype=object))
@@ -0,0 +1,146 @@
+import collections
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import email_engine
+from domain_index import DomainIndex
+from known_people import KnownPeople
+from pattern_ranking import PatternRanking
+from pattern_store import PatternStore
+from run_log import configure_logging, counters, logger
+
+# Per-process state set up once by the pool initializer
+_worker_state = {}
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def init_worker(email_patterns=None, store_path=None, verbose=False, pattern_counts=None, top_k=None):
+    """Load the pattern map (and, for candidates, the pattern counts) once per worker process and index it.
+
+    A store also supplies the pattern confidences and the known people.
+    """
+    configure_logging(verbose)
+    confidence = known_emails = None
+    if store_path is not None:
+        store = PatternStore(store_path, read_only=True)
+        email_patterns = store.load_patterns()
+        confidence = store.load_confidence()
+        known_emails = store.load_known()
+        if top_k is not None:
+            pattern_counts = store.load_counts()
+    if email_patterns is not None:
+        _worker_state['email_patterns'] = email_patterns
+        _worker_state['domain_index'] = DomainIndex(email_patterns, confidence)
+    if known_emails is not None:
+        _worker_state['known_people'] = KnownPeople(known_emails)
+    if pattern_counts is not None:
+        _worker_state['ranking'] = PatternRanking(pattern_counts)
+        _worker_state['top_k'] = top_k
+
+
+def analyze_shard(shard):
+    return email_engine.analyze_frame(shard)
+
+
+def generate_shard(shard):
+    return email_engine.generate_frame(
+        shard, _worker_state['email_patterns'], _worker_state['domain_index'], _worker_state.get('known_people')
+    )
+
+
+def candidates_shard(shard):
+    return email_engine.candidates_frame(
+        shard, _worker_state['ranking'], _worker_state['top_k'], _worker_state['domain_index'],
+        _worker_state.get('known_people')
+    )
+
+
+def predict_shard(shard):
+    return email_engine.predict_frame(shard)
+
+
+TASKS = {
+    'analyze': analyze_shard,
+    'generate': generate_shard,
+    'candidates': candidates_shard,
+    'predict': predict_shard,
+}
+
+
+def run_task(task, shard):
+    """Run one shard in a worker; its run counters travel back with the result"""
+    counters.reset()
+    return TASKS[task](shard), counters.snapshot()
+
+
+class ProcessBackend:
+    """Runs one pipeline over DataFrame shards on a pool of worker processes.
+
+    The pattern map (or the path of a pattern store to read it from) is sent
+    to each worker once, when the pool starts; the 'candidates' task also
+    needs top_k, and the pattern counts unless they come from the store. Shards are submitted through a
+    bounded window so only a few are in flight at a time, and results always
+    come back in input order.
+    """
+
+    def __init__(self, task, workers=None, email_patterns=None, store_path=None, pattern_counts=None, top_k=None):
+        self.task = task
+        self.workers = workers or default_workers()
+        self.window = self.workers * 2
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=init_worker,
+            initargs=(email_patterns, store_path, logger.isEnabledFor(logging.DEBUG), pattern_counts, top_k)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def map(self, shards):
+        """Process an iterable of frames, yielding results in the same order"""
+        pending = collections.deque()
+        for shard in shards:
+            pending.append(self.executor.submit(run_task, self.task, shard))
+            if len(pending) >= self.window:
+                yield self._collect(pending.popleft())
+        while pending:
+            yield self._collect(pending.popleft())
+
+    def _collect(self, future):
+        result, worker_counts = future.result()
+        counters.merge(worker_counts)
+        return result
+
+    def run_chunked(self, df, chunk_size=email_engine.DEFAULT_CHUNK_SIZE, on_chunk=None, cancel_event=None,
+                    finish_chunk=None):
+        """Parallel counterpart of email_engine.run_chunked; finish_chunk runs in this process"""
+        total_rows = len(df)
+        if total_rows == 0:
+            result_df = self._collect(self.executor.submit(run_task, self.task, df))
+            return finish_chunk(result_df) if finish_chunk is not None else result_df
+
+        shards = (df.iloc[start:start + chunk_size] for start in range(0, total_rows, chunk_size))
+        results = []
+        rows_done = 0
+        for result_chunk in self.map(shards):
+            if finish_chunk is not None:
+                result_chunk = finish_chunk(result_chunk)
+            results.append(result_chunk)
+            # Input rows, as in email_engine.run_chunked; every shard but the last is full
+            rows_done = min(rows_done + chunk_size, total_rows)
+            if on_chunk is not None:
+                on_chunk(result_chunk, rows_done, total_rows)
+            # Shards already submitted are dropped when the pool closes
+            email_engine.check_cancelled(cancel_event)
+
+        return email_engine.concat_frames(results)
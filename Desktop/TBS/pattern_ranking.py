@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+# Weight of a domain's own pattern shares against the global shares in a candidate's score
+DOMAIN_WEIGHT = 0.8
+
+# Candidates generated per lead by default
+DEFAULT_TOP_K = 3
+
+
+class PatternRanking:
+    """Scores of every stored pattern for each domain, for ranking candidate emails.
+
+    A pattern's global share is its fraction of all stored counts, and its
+    domain share its fraction of the domain's counts. For a known domain a
+    pattern scores DOMAIN_WEIGHT * domain share + (1 - DOMAIN_WEIGHT) *
+    global share, so the domain's own patterns come first and the globally
+    common ones fill the remaining ranks. Unknown domains are scored by
+    global share alone. Ties go to the globally more common pattern.
+
+    Built once from PatternStore.load_counts(); top_k() then works on whole
+    arrays of domains at once.
+    """
+
+    def __init__(self, pattern_counts, domain_weight=DOMAIN_WEIGHT):
+        counts = pd.DataFrame(list(pattern_counts), columns=['domain', 'pattern', 'count'])
+        self.domain_weight = domain_weight
+
+        totals = counts.groupby('pattern', sort=False)['count'].sum()
+        self.global_share = (totals / totals.sum()).sort_values(ascending=False, kind='stable')
+        self.patterns = self.global_share.index.to_numpy(dtype=object)
+
+        # Each domain's rows are contiguous, so a domain's patterns are one slice
+        counts = counts.sort_values('domain', kind='stable').reset_index(drop=True)
+        domain_totals = counts.groupby('domain', sort=False)['count'].transform('sum')
+        self.domain_pattern = counts['pattern'].to_numpy(dtype=object)
+        self.domain_score = (
+            domain_weight * counts['count'] / domain_totals
+            + (1 - domain_weight) * counts['pattern'].map(self.global_share)
+        ).to_numpy()
+        domains, starts = np.unique(counts['domain'].to_numpy(dtype=object), return_index=True)
+        ends = np.append(starts[1:], len(counts))
+        self.slices = {domain: (start, end) for domain, start, end in zip(domains, starts, ends)}
+        self.resolved = {}  # lead domain -> (start, end) of its known domain's rows, or None
+
+    def rows(self, domain, domain_index=None):
+        """(start, end) of the counts of domain, or of the known domain it falls back to; None if unknown"""
+        if domain not in self.resolved:
+            known = self.known_domain(domain, domain_index)
+            self.resolved[domain] = self.slices[known] if known is not None else None
+        return self.resolved[domain]
+
+    def __len__(self):
+        return len(self.slices)
+
+    def known_domain(self, domain, domain_index=None):
+        """domain itself if it has counts, else the related known domain the index finds, else None"""
+        if domain in self.slices:
+            return domain
+        if domain_index is not None:
+            known = domain_index.find(domain)
+            if known in self.slices:
+                return known
+        return None
+
+    def top_k(self, domains, k, domain_index=None):
+        """Top k (pattern, score) candidates for each of an array of distinct domains.
+
+        Returns a frame with 'domain_code' (position in domains), 'rank'
+        (from 1), 'pattern' and 'score', sorted by domain_code and rank.
+        """
+        global_top = self.patterns[:k]
+        global_score = self.global_share.to_numpy()[:k]
+
+        slices = [self.rows(domain, domain_index) for domain in domains]
+        is_known = np.array([rows is not None for rows in slices], dtype=bool)
+        starts = np.array([rows[0] if rows else 0 for rows in slices], dtype=np.int64)
+        lengths = np.array([rows[1] - rows[0] if rows else 0 for rows in slices], dtype=np.int64)
+        own_rows = np.repeat(starts, lengths) + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+        # Every domain gets the global top k; known domains also get their own patterns
+        weight = np.where(is_known, 1 - self.domain_weight, 1.0)
+        candidates = pd.DataFrame({
+            'domain_code': np.concatenate([
+                np.repeat(np.arange(len(domains)), len(global_top)),
+                np.repeat(np.arange(len(domains)), lengths),
+            ]),
+            'pattern': np.concatenate([np.tile(global_top, len(domains)), self.domain_pattern[own_rows]]),
+            'score': np.concatenate([(weight[:, None] * global_score[None, :]).ravel(), self.domain_score[own_rows]]),
+        })
+        candidates['global_share'] = candidates['pattern'].map(self.global_share)
+        # A domain's own score for a pattern is always above its global-only score
+        candidates = candidates.sort_values(
+            ['domain_code', 'score', 'global_share'], ascending=[True, False, False], kind='stable'
+        ).drop_duplicates(['domain_code', 'pattern'])
+        candidates['rank'] = candidates.groupby('domain_code').cumcount() + 1
+        candidates = candidates[candidates['rank'] <= k]
+        return candidates[['domain_code', 'rank', 'pattern', 'score']].reset_index(drop=True)
@@ -0,0 +1,194 @@
+import os
+import sqlite3
+
+# Pattern database kept next to the application
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'email_patterns.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pattern_counts (
+    domain TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    PRIMARY KEY (domain, pattern)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS known_emails (
+    person_key TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    pattern TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', 0), ('next_seen', 0);
+"""
+
+UPSERT = """
+INSERT INTO pattern_counts (domain, pattern, count, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (domain, pattern) DO UPDATE SET
+    count = count + excluded.count,
+    last_seen = MAX(last_seen, excluded.last_seen)
+"""
+
+# The email seen last for a person wins
+UPSERT_KNOWN = """
+INSERT INTO known_emails (person_key, email, pattern) VALUES (?, ?, ?)
+ON CONFLICT (person_key) DO UPDATE SET email = excluded.email, pattern = excluded.pattern
+"""
+
+# Consensus per domain: the majority pattern, its count, the domain's total
+# count (support) and the majority's share of it (confidence). A tie goes to
+# the pattern seen last. Domains in order of first appearance.
+LOAD_CONSENSUS = """
+SELECT domain, pattern, count, support, CAST(count AS REAL) / support AS confidence FROM (
+    SELECT domain, pattern, count,
+           SUM(count) OVER (PARTITION BY domain) AS support,
+           ROW_NUMBER() OVER (PARTITION BY domain ORDER BY count DESC, last_seen DESC) AS choice,
+           MIN(first_seen) OVER (PARTITION BY domain) AS domain_first_seen
+    FROM pattern_counts
+)
+WHERE choice = 1
+ORDER BY domain_first_seen
+"""
+
+# Column labels of the consensus table
+CONSENSUS_COLUMNS = ['Domain', 'Email Format', 'Count', 'Support', 'Confidence']
+
+
+class PatternStore:
+    """Per-domain email pattern counts persisted in a local SQLite file.
+
+    Batches of analyzed emails are upserted incrementally, so a new export
+    only adds its own counts instead of rebuilding everything. Every row
+    gets a sequence number, so domains keep the order they were first seen
+    in. Each domain's pattern is the consensus of all its counts: the
+    majority pattern, with the share of the domain's emails it covers as
+    its confidence. The verified email of
+    each analyzed person is kept too, keyed on their normalized first name,
+    last name and domain, for known_people.KnownPeople.
+
+    Open with read_only=True from worker processes; the database runs in WAL
+    mode so readers never block each other or the writer. A connection may be
+    shared between the GUI thread and its worker threads, which never write
+    concurrently.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self._connection = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @property
+    def connection(self):
+        """Open the database on first use"""
+        if self._connection is None:
+            if self.read_only:
+                self._connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                self._connection = sqlite3.connect(self.path, check_same_thread=False)
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def version(self):
+        """Number of batches written so far; 0 for a store that does not exist yet"""
+        if self.read_only and not self.exists():
+            return 0
+        row = self.connection.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def upsert_counts(self, rows, known_rows=()):
+        """Add one batch of (domain, pattern, count, first_pos, last_pos) rows.
+
+        Positions are row offsets within the batch; they are shifted past
+        everything already stored so later batches always count as newer.
+        The batch's (person_key, email, pattern) rows are stored in the same
+        transaction.
+        """
+        if self.read_only:
+            raise PermissionError("Pattern store is open read-only")
+
+        with self.connection:
+            offset = self.connection.execute(
+                "SELECT value FROM store_meta WHERE key = 'next_seen'"
+            ).fetchone()[0]
+            batch = [
+                (domain, pattern, int(count), offset + int(first_pos), offset + int(last_pos))
+                for domain, pattern, count, first_pos, last_pos in rows
+            ]
+            self.connection.executemany(UPSERT, batch)
+            self.connection.executemany(UPSERT_KNOWN, known_rows)
+            next_seen = max((row[4] for row in batch), default=offset - 1) + 1
+            self.connection.execute(
+                "UPDATE store_meta SET value = ? WHERE key = 'next_seen'", (next_seen,)
+            )
+            self.connection.execute(
+                "UPDATE store_meta SET value = value + 1 WHERE key = 'version'"
+            )
+
+    def add_frame(self, df):
+        """Upsert the pattern counts of a frame analyzed by process_data"""
+        stored = df.loc[df['domain'].notna(), ['domain', 'format']].copy()
+        stored['pattern'] = stored['format'].str.split('@').str[0]  # Remove domain part for storage
+        stored['position'] = range(len(stored))
+        counts = stored.groupby(['domain', 'pattern'], sort=False, observed=True)['position'].agg(['size', 'min', 'max'])
+        self.upsert_counts(
+            (
+                (domain, pattern, size, first_pos, last_pos)
+                for (domain, pattern), size, first_pos, last_pos in zip(
+                    counts.index, counts['size'], counts['min'], counts['max']
+                )
+            ),
+            self.known_rows(df)
+        )
+
+    def known_rows(self, df):
+        """(person_key, email, pattern) of each person in an analyzed frame, the last row of a person winning"""
+        if 'person_key' not in df:
+            return []
+        known = df.loc[df['person_key'].notna(), ['person_key', 'Email', 'format']]
+        known = known.drop_duplicates('person_key', keep='last')
+        emails = known['Email'].astype(object).str.strip().str.lower()
+        patterns = known['format'].astype(object).str.split('@').str[0]
+        return list(zip(known['person_key'].astype(object), emails, patterns))
+
+    def load_counts(self):
+        """Return every stored (domain, pattern, count) row"""
+        if self.read_only and not self.exists():
+            return []
+        return self.connection.execute("SELECT domain, pattern, count FROM pattern_counts").fetchall()
+
+    def load_known(self):
+        """Return every stored (person_key, email, pattern) row"""
+        if self.read_only and not self.exists():
+            return []
+        try:
+            return self.connection.execute("SELECT person_key, email, pattern FROM known_emails").fetchall()
+        except sqlite3.OperationalError:
+            # A store written before known emails were kept, opened read-only
+            return []
+
+    def load_consensus(self):
+        """Return (domain, pattern, count, support, confidence) rows, one per domain"""
+        if self.read_only and not self.exists():
+            return []
+        return self.connection.execute(LOAD_CONSENSUS).fetchall()
+
+    def load_patterns(self):
+        """Return the domain -> majority pattern map used for generation"""
+        return {domain: pattern for domain, pattern, _, _, _ in self.load_consensus()}
+
+    def load_confidence(self):
+        """Return the domain -> confidence map of the consensus patterns"""
+        return {domain: confidence for domain, _, _, _, confidence in self.load_consensus()}
@@ -0,0 +1,318 @@
+"""Registry of email username formats, each declared as a template.
+
+A template is literal text with name fields in braces:
+
+    {first}  normalized first name     {f}  its first letter
+    {last}   normalized last name      {l}  its first letter
+
+so '{first}.{last}' builds "john.smith" and '{f}{last}' builds "jsmith".
+Each template is parsed once into its parts. The same parts build usernames
+for generation and prediction, one vectorized concatenation per part, and
+detect patterns during analysis by comparing the usernames they would
+build against the real ones. Adding a format is one register() call.
+
+Usernames no registered template builds go through infer(), which aligns
+their tokens against the name parts and emits a generalized template,
+e.g. "smith-john" -> '{last}-{first}' or "john.q.smith2" -> FirstName.LastName.
+"""
+import re
+import string
+
+import numpy as np
+import pandas as pd
+
+FIELD_RE = re.compile(r'\{([^{}]*)\}')
+NAME_FIELDS = {'first', 'last'}
+INITIAL_FIELDS = {'f': 'first', 'l': 'last'}
+
+# Pattern used for domains without a known pattern, and for unknown pattern names
+DEFAULT_PATTERN = 'FirstNameFirstLetterLastName'
+
+# Username shape markers: a full name, an initial, any other letters, digits
+SHAPE_FIELDS = {'\x01': 'first', '\x02': 'last', '\x03': 'f', '\x04': 'l'}
+SHAPE_OTHER = 'a'
+SHAPE_DIGITS = '9'
+SHAPE_RE = re.compile(r'[\x01-\x04]|a+|9+|[^\x01-\x04a9]+')
+# Character classes of an ASCII username in one str.translate() pass
+SHAPE_CLASSES = str.maketrans({
+    **{char: SHAPE_OTHER for char in string.ascii_letters},
+    **{char: SHAPE_DIGITS for char in string.digits},
+})
+
+
+def first_letter(series):
+    """Vectorized name[0]; empty names give NaN so the built username is NaN too"""
+    return series.str[0]
+
+
+def name_fields(first_name, last_name):
+    """Columns a template can use, keyed by field name"""
+    return {
+        'first': first_name,
+        'last': last_name,
+        'f': first_letter(first_name),
+        'l': first_letter(last_name),
+    }
+
+
+def take(fields, positions, parts):
+    """The fields parts use, for the rows at positions"""
+    return {value: fields[value].iloc[positions] for kind, value in parts if kind == 'field'}
+
+
+def parse_template(template):
+    """Split a template into ('text', literal) and ('field', name) parts"""
+    parts = []
+    position = 0
+    for match in FIELD_RE.finditer(template):
+        if match.start() > position:
+            parts.append(('text', template[position:match.start()]))
+        field = match.group(1)
+        if field not in NAME_FIELDS and field not in INITIAL_FIELDS:
+            raise ValueError(f"Unknown field {{{field}}} in pattern template '{template}'")
+        parts.append(('field', field))
+        position = match.end()
+    if position < len(template):
+        parts.append(('text', template[position:]))
+
+    if not any(kind == 'field' for kind, _ in parts):
+        raise ValueError(f"Pattern template '{template}' has no name fields")
+    if any(kind == 'text' and ('{' in text or '}' in text) for kind, text in parts):
+        raise ValueError(f"Unbalanced braces in pattern template '{template}'")
+    return parts
+
+
+class PatternTemplate:
+    """One username format compiled from its template.
+
+    aliases are extra templates that detect as this pattern but are never
+    used to build, e.g. "fernandof" for FirstNameFirstLetterLastName.
+    """
+
+    def __init__(self, name, template, aliases=()):
+        self.name = name
+        self.template = template
+        self.parts = parse_template(template)
+        self.detectors = [parse_template(alias) for alias in aliases] + [self.parts]
+
+    def build(self, fields, parts=None):
+        """Usernames from name_fields() of normalized names; NaN where a name or a needed letter is missing"""
+        username = None
+        for kind, value in parts or self.parts:
+            if kind == 'field':
+                value = fields[value]
+            username = value if username is None else username + value
+        return username
+
+
+def username_shape(username, first_name, last_name):
+    """username with each full name replaced by a marker and every other character by its class.
+
+    Letters left over become the first or last initial's marker where they
+    match one, else 'a'; digits become '9'; separators stay as they are.
+    The shape no longer depends on the names themselves, so the many rows
+    sharing one reduce to a single alignment.
+
+    Called once per residual row, so it sticks to str methods that run in
+    C; only non-ASCII usernames take the per-character loop.
+    """
+    # The longer name first, so a name inside the other is not split up
+    if len(first_name) >= len(last_name):
+        username = username.replace(first_name, '\x01').replace(last_name, '\x02')
+    else:
+        username = username.replace(last_name, '\x02').replace(first_name, '\x01')
+
+    if username.isascii():
+        for initial, marker in ((first_name[0], '\x03'), (last_name[0], '\x04')):
+            if initial.isalpha():
+                username = username.replace(initial, marker)
+        return username.translate(SHAPE_CLASSES)
+
+    shape = []
+    for char in username:
+        if char in SHAPE_FIELDS:
+            shape.append(char)
+        elif char.isalpha():
+            shape.append('\x03' if char == first_name[0] else '\x04' if char == last_name[0] else SHAPE_OTHER)
+        elif char.isdigit():
+            shape.append(SHAPE_DIGITS)
+        else:
+            shape.append(char)
+    return ''.join(shape)
+
+
+def shape_template(shape):
+    """Generalized template for a username shape, or None if it cannot be aligned.
+
+    Single letters that match no name part (middle initials) and digits
+    (numbering of namesakes) are person-specific, so they are dropped, along
+    with one of the separators around them when there is one on each side;
+    separators at either end are dropped too.
+    Longer runs of unmatched letters are another name, such as a nickname,
+    that no template can build, and so are shapes without a full name.
+    """
+    tokens = SHAPE_RE.findall(shape)
+    kept = []
+    for token in tokens:
+        if token in SHAPE_FIELDS:
+            kept.append(('field', SHAPE_FIELDS[token]))
+        elif token[0] == SHAPE_OTHER and len(token) > 1:
+            return None
+        elif token[0] in (SHAPE_OTHER, SHAPE_DIGITS):
+            kept.append(('drop', token))
+        else:
+            kept.append(('text', token))
+
+    parts = []
+    for position, (kind, value) in enumerate(kept):
+        if kind != 'drop':
+            parts.append((kind, value))
+            continue
+        following = kept[position + 1][0] if position + 1 < len(kept) else None
+        # With a separator on both sides, one of them still separates the fields around it
+        if parts and parts[-1][0] == 'text' and following == 'text':
+            parts.pop()
+    while parts and parts[0][0] == 'text':
+        parts.pop(0)
+    while parts and parts[-1][0] == 'text':
+        parts.pop()
+
+    if not any(kind == 'field' and value in NAME_FIELDS for kind, value in parts):
+        return None
+    if any(kind == 'text' and ('{' in value or '}' in value) for kind, value in parts):
+        return None
+    return ''.join(f"{{{value}}}" if kind == 'field' else value for kind, value in parts)
+
+
+def initials(parts):
+    """Names whose first letter a template needs"""
+    return [INITIAL_FIELDS[value] for kind, value in parts if kind == 'field' and value in INITIAL_FIELDS]
+
+
+class PatternRegistry:
+    """Ordered collection of pattern templates; the order is the detection priority"""
+
+    def __init__(self, default_pattern=DEFAULT_PATTERN):
+        self.templates = {}
+        self.default_pattern = default_pattern
+        self.compiled = {}  # ad-hoc templates used as pattern names, compiled once
+        self.names = {}  # template or alias -> pattern name
+        self.inferred = {}  # username shape -> pattern name, template or None
+
+    def register(self, name, template, aliases=()):
+        self.templates[name] = PatternTemplate(name, template, aliases)
+        for text in [template, *aliases]:
+            self.names.setdefault(text, name)
+        self.inferred.clear()
+        return self.templates[name]
+
+    def __contains__(self, name):
+        return name in self.templates
+
+    def __iter__(self):
+        return iter(self.templates.values())
+
+    def get(self, pattern):
+        """Template for a pattern name, or a template string such as '{f}.{last}', or None"""
+        if pattern in self.templates:
+            return self.templates[pattern]
+        if isinstance(pattern, str) and '{' in pattern:
+            if pattern not in self.compiled:
+                try:
+                    self.compiled[pattern] = PatternTemplate(pattern, pattern)
+                except ValueError:
+                    self.compiled[pattern] = None
+            return self.compiled[pattern]
+        return None
+
+    def synthesize(self, first_name, last_name, patterns):
+        """Build usernames with one vectorized concatenation per distinct pattern.
+
+        Rows are grouped by pattern, each group is built in one go and the
+        results are scattered back into the original row order. Unknown
+        patterns use the default pattern. Rows with a missing name, or whose
+        pattern needs a letter from an empty name, come back as NaN.
+        """
+        default = self.templates[self.default_pattern]
+        fields = name_fields(first_name, last_name)
+        usernames = np.full(len(patterns), np.nan, dtype=object)
+        groups = patterns.groupby(patterns.to_numpy(), sort=False).indices
+        for pattern, positions in groups.items():
+            template = self.get(pattern) or default
+            usernames[positions] = template.build(take(fields, positions, template.parts)).to_numpy(dtype=object)
+        return pd.Series(usernames, index=patterns.index, dtype=object)
+
+    def detect(self, username, first_name, last_name):
+        """Name of the first pattern, in priority order, that builds each username.
+
+        Names must be normalized with missing ones as ''. Rows without a
+        username are 'invalid', as are rows still unmatched when a template
+        needs the first letter of a name they have empty. Rows no template
+        matches are NaN. Each template only compares the rows still
+        unmatched, so later patterns cost little.
+        """
+        result = np.where(username.isna().to_numpy(), 'invalid', None).astype(object)
+        fields = name_fields(first_name, last_name)
+        empty = {'first': (first_name == '').to_numpy(), 'last': (last_name == '').to_numpy()}
+        checked = set()
+        for template in self.templates.values():
+            for parts in template.detectors:
+                for name in initials(parts):
+                    if name not in checked:
+                        checked.add(name)
+                        result[empty[name] & pd.isna(result)] = 'invalid'
+
+                positions = np.flatnonzero(pd.isna(result))
+                if len(positions) == 0:
+                    return pd.Series(result, index=username.index, dtype=object)
+                built = template.build(take(fields, positions, parts), parts)
+                matched = (username.iloc[positions] == built).to_numpy()
+                result[positions[matched]] = template.name
+
+        return pd.Series(result, index=username.index, dtype=object)
+
+    def infer_shape(self, shape):
+        """Pattern for a username shape: a registered name if one has its template, else the template"""
+        if shape not in self.inferred:
+            template = shape_template(shape)
+            self.inferred[shape] = self.names.get(template, template)
+        return self.inferred[shape]
+
+    def infer(self, username, first_name, last_name):
+        """Pattern of each username by token alignment, for rows detect() left unmatched.
+
+        Names must be normalized and non-empty. Rows are reduced to their
+        username_shape, each distinct shape is aligned once (and memoized
+        for later calls) and the result broadcast back. Rows without a full
+        name in their username are NaN.
+        """
+        # Iterating Arrow-backed strings is slow; object arrays yield the str objects directly
+        columns = (column.to_numpy(dtype=object) for column in (username, first_name, last_name))
+        shapes = np.array([username_shape(u, f, l) for u, f, l in zip(*columns)], dtype=object)
+        codes, unique_shapes = pd.factorize(shapes)
+        patterns = np.array([self.infer_shape(shape) for shape in unique_shapes] + [None], dtype=object)
+        return pd.Series(patterns[codes], index=username.index, dtype=object)
+
+
+def default_registry():
+    """The formats the app knows, in detection priority order"""
+    registry = PatternRegistry()
+    # Detected and built as "d" + first name, e.g. djoe
+    registry.register('LastNameFirstLetterFirstName', 'd{first}')
+    # ashleyj, lisaa; "fernandof" (first name + its own first letter) detects as this too
+    registry.register('FirstNameFirstLetterLastName', '{first}{l}', aliases=['{first}{f}'])
+    registry.register('FirstNameLastName', '{first}{last}')  # willcom
+    registry.register('FirstLetterLastName', '{f}{last}')
+    registry.register('FirstName.LastName', '{first}.{last}')
+    registry.register('FirstName_LastName', '{first}_{last}')
+    registry.register('LastName', '{last}')
+    registry.register('FirstName', '{first}')
+    registry.register('FirstName.FirstLetterLastName', '{first}.{l}')
+    registry.register('FirstLetter.LastName', '{f}.{last}')
+    registry.register('LastName.FirstName', '{last}.{first}')
+    registry.register('LastNameFirstName', '{last}{first}')
+    registry.register('LastName_FirstName', '{last}_{first}')
+    return registry
+
+
+PATTERNS = default_registry()
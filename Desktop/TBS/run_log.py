@@ -0,0 +1,96 @@
+import collections
+import itertools
+import logging
+
+logger = logging.getLogger('email_generator')
+
+# Human-readable names for the run counters, in summary order
+COUNTER_LABELS = {
+    'analyzed_emails': "emails analyzed",
+    'invalid_emails': "invalid emails",
+    'inferred_patterns': "patterns inferred by token alignment",
+    'unrecognized_patterns': "unrecognized patterns",
+    'generated_emails': "emails generated",
+    'known_emails': "known emails reused",
+    'fallback_domain_matches': "fallback domain matches",
+    'default_pattern_rows': "rows using the default pattern",
+    'low_confidence_rows': "rows using a domain pattern without a clear majority",
+    'generation_errors': "rows that could not be generated",
+    'candidate_emails': "candidate emails",
+    'leads_without_candidates': "leads without candidates",
+    'predicted_emails': "emails predicted",
+    'prediction_errors': "rows that could not be predicted",
+    'verified_valid': "emails verified valid",
+    'verified_invalid': "emails rejected by their mail server",
+    'verified_catch_all': "emails at catch-all domains",
+    'verified_unknown': "emails that could not be verified",
+    'verified_no_mail_server': "emails at domains without a mail server",
+}
+
+# (hits counter, lookups counter, label) for the session caches
+CACHE_RATES = [
+    ('url_cache_hits', 'distinct_urls', "URL cache hit rate"),
+    ('name_cache_hits', 'distinct_names', "name cache hit rate"),
+]
+
+
+def configure_logging(verbose=False):
+    """Quiet by default; verbose turns on info output and sampled debug examples"""
+    logging.basicConfig(format='%(levelname)s %(name)s: %(message)s')
+    logger.setLevel(logging.DEBUG if verbose else logging.WARNING)
+
+
+class RunCounters:
+    """Aggregated counts for the current run, e.g. "412 unrecognized patterns".
+
+    Hot loops report one count per chunk instead of printing per row. When
+    debug logging is on, the first few examples of each counter are logged
+    too; examples is a callable so they are only built when needed.
+    """
+
+    def __init__(self, sample_size=5):
+        self.sample_size = sample_size
+        self.reset()
+
+    def reset(self):
+        self.counts = collections.Counter()
+        self.sampled = collections.Counter()
+
+    def add(self, name, count, examples=None):
+        count = int(count)
+        if not count:
+            return
+        self.counts[name] += count
+
+        remaining = self.sample_size - self.sampled[name]
+        if examples is not None and remaining > 0 and logger.isEnabledFor(logging.DEBUG):
+            for example in itertools.islice(iter(examples()), remaining):
+                logger.debug("%s: %s", COUNTER_LABELS.get(name, name), example)
+                self.sampled[name] += 1
+
+    def snapshot(self):
+        return dict(self.counts)
+
+    def merge(self, counts):
+        """Add counts collected elsewhere, e.g. in a worker process"""
+        self.counts.update(counts)
+
+    def summary(self):
+        return summarize(self.counts)
+
+
+def summarize(counts):
+    """One-line summary of a counts dict, e.g. a RunCounters.snapshot() kept after its run"""
+    parts = [
+        f"{counts[name]} {label}"
+        for name, label in COUNTER_LABELS.items()
+        if counts.get(name)
+    ]
+    for hits, lookups, label in CACHE_RATES:
+        if counts.get(lookups):
+            parts.append(f"{counts.get(hits, 0) / counts[lookups]:.0%} {label}")
+    return ", ".join(parts)
+
+
+# Counters for the run in progress in this process
+counters = RunCounters()
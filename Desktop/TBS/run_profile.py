@@ -0,0 +1,140 @@
+import contextlib
+import cProfile
+import datetime
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+
+from run_log import logger
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Functions kept from a cProfile run, by cumulative time
+CPROFILE_TOP = 40
+
+# Held while a job runs under cProfile; profilers would replace each other
+_cprofile_lock = threading.Lock()
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class RunProfile:
+    """Wall time, rows/sec and peak RSS for each stage of one job.
+
+    Stages are timed with `with profile.stage('analyze', rows):`. A stage
+    entered more than once (e.g. the preview, once per chunk) accumulates
+    into one entry. Stages may be recorded from the worker thread and the Tk
+    main loop at the same time.
+
+    With use_cprofile, start() and stop() wrap the job in cProfile. Worker
+    processes are not profiled, and only one cProfile run can be active at a
+    time; a job started while another is profiled runs without it.
+    """
+
+    def __init__(self, job, use_cprofile=False):
+        self.job = job
+        self.created = datetime.datetime.now().isoformat(timespec='seconds')
+        self.stages = {}
+        self.counts = None  # run counters of the job, snapshot when it finished
+        self.lock = threading.Lock()
+        self.profiler = cProfile.Profile() if use_cprofile else None
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, rows)
+
+    def add(self, name, seconds, rows=None):
+        with self.lock:
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'rows': 0, 'calls': 0})
+            entry['seconds'] += seconds
+            entry['rows'] += rows or 0
+            entry['calls'] += 1
+            entry['peak_rss_mb'] = peak_rss_mb()
+
+    def start(self):
+        if self.profiler is None:
+            return
+        if not _cprofile_lock.acquire(blocking=False):
+            logger.warning(f"cProfile not started for {self.job}: another job is being profiled")
+            self.profiler = None
+            return
+        self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            _cprofile_lock.release()
+
+    def stage_list(self):
+        with self.lock:
+            stages = [(name, dict(entry)) for name, entry in self.stages.items()]
+        for name, entry in stages:
+            entry['stage'] = name
+            entry['seconds'] = round(entry['seconds'], 4)
+            entry['rows_per_second'] = (
+                round(entry['rows'] / entry['seconds'], 1) if entry['rows'] and entry['seconds'] > 0 else None
+            )
+        return [entry for _, entry in stages]
+
+    def summary(self):
+        """Compact one-line summary, e.g. "analyze 1.20s (83,000 rows/s), store 0.30s; peak 180 MB" """
+        parts = []
+        for entry in self.stage_list():
+            text = f"{entry['stage']} {entry['seconds']:.2f}s"
+            if entry['rows_per_second']:
+                text += f" ({entry['rows_per_second']:,.0f} rows/s)"
+            parts.append(text)
+        summary = ", ".join(parts)
+        peak = peak_rss_mb()
+        if peak is not None:
+            summary += f"; peak {peak:,.0f} MB"
+        return summary
+
+    def cprofile_stats(self):
+        """Top functions by cumulative time from the cProfile run, if any"""
+        if self.profiler is None:
+            return None
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        stats.sort_stats('cumulative')
+        rows = []
+        for func in stats.fcn_list[:CPROFILE_TOP]:
+            calls, primitive_calls, total_time, cumulative_time, _ = stats.stats[func]
+            filename, line, name = func
+            rows.append({
+                'function': f"{filename}:{line}({name})",
+                'calls': calls,
+                'total_time': round(total_time, 4),
+                'cumulative_time': round(cumulative_time, 4),
+            })
+        return rows
+
+    def to_dict(self):
+        return {
+            'job': self.job,
+            'created': self.created,
+            'stages': self.stage_list(),
+            'peak_rss_mb': peak_rss_mb(),
+            'counters': self.counts,
+            'cprofile': self.cprofile_stats(),
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
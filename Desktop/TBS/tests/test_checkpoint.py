@@ -0,0 +1,69 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import benchmark
+import email_engine
+from checkpoint import JobCheckpoint
+
+CHUNK_SIZE = 500
+
+
+def predict(input_path, output_path, checkpoint=None, on_chunk=None, cancel_event=None):
+    return email_engine.stream_file(
+        input_path, output_path, email_engine.predict_frame, email_engine.PREDICT_EXPORT, CHUNK_SIZE,
+        on_chunk=on_chunk, required_columns=email_engine.PREDICT_COLUMNS, checkpoint=checkpoint,
+        cancel_event=cancel_event
+    )
+
+
+def job_checkpoint(input_path, output_path):
+    return JobCheckpoint('predict', input_path, output_path, email_engine.PREDICT_EXPORT, CHUNK_SIZE)
+
+
+@pytest.fixture
+def input_path(tmp_path):
+    path = str(tmp_path / 'predictor.csv')
+    benchmark.synthetic_predictor_frame(2300).to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.csv.gz'])
+def test_resume_after_interrupt_matches_a_full_run(tmp_path, input_path, extension):
+    full_path = str(tmp_path / f"full{extension}")
+    output_path = str(tmp_path / f"resumed{extension}")
+    predict(input_path, full_path)
+
+    # Stop after two chunks, then leave half a chunk behind as a crash would
+    cancel_event = threading.Event()
+
+    def on_chunk(result_chunk, rows_done):
+        if rows_done >= 2 * CHUNK_SIZE:
+            cancel_event.set()
+
+    with pytest.raises(email_engine.JobCancelled):
+        predict(input_path, output_path, job_checkpoint(input_path, output_path), on_chunk, cancel_event)
+    assert job_checkpoint(input_path, output_path).pending()['rows_read'] == 2 * CHUNK_SIZE
+    with open(output_path, 'ab') as f:
+        f.write(b'half,written,row\n' if extension == '.csv' else b'\x1f\x8b truncated')
+
+    rows = predict(input_path, output_path, job_checkpoint(input_path, output_path))
+    assert rows == 2300
+    assert pd.read_csv(output_path).equals(pd.read_csv(full_path))
+    assert not os.path.exists(output_path + '.checkpoint.json')
+
+
+def test_changed_input_starts_over(tmp_path, input_path):
+    output_path = str(tmp_path / 'out.csv')
+    checkpoint = job_checkpoint(input_path, output_path)
+    with open(output_path, 'w') as f:
+        f.write('header\n')
+    checkpoint.resume_point()
+    checkpoint.save(CHUNK_SIZE, CHUNK_SIZE)
+    assert job_checkpoint(input_path, output_path).resume_point() == (CHUNK_SIZE, CHUNK_SIZE)
+
+    stat = os.stat(input_path)
+    os.utime(input_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert job_checkpoint(input_path, output_path).resume_point() == (0, 0)
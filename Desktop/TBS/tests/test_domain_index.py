@@ -0,0 +1,63 @@
+import random
+
+from domain_index import MIN_FALLBACK_CONFIDENCE, DomainIndex
+
+
+def linear_scan(email_patterns, domain, confidence, min_confidence=MIN_FALLBACK_CONFIDENCE):
+    """The fallback scan DomainIndex replaced: first related domain in insertion order"""
+    for known_domain in email_patterns:
+        if confidence.get(known_domain, 1.0) < min_confidence:
+            continue
+        if known_domain in domain or domain in known_domain:
+            return known_domain
+    return None
+
+
+def random_domain(rng):
+    labels = [''.join(rng.choice('abcde') for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(1, 3))]
+    return '.'.join(labels) + rng.choice(['.com', '.io', '.co.uk', ''])
+
+
+def queries(rng, known_domains):
+    yield ''
+    yield 'a'
+    yield 'ab'
+    yield '.'
+    for known_domain in known_domains:
+        yield known_domain
+        yield 'mail.' + known_domain
+        yield known_domain[1:]
+        yield known_domain[:-1]
+        yield known_domain[rng.randint(0, len(known_domain)):][:3]
+    for _ in range(50):
+        yield random_domain(rng)
+
+
+def test_find_matches_linear_scan():
+    rng = random.Random(0)
+    for _ in range(200):
+        known_domains = [random_domain(rng) for _ in range(rng.randint(0, 30))]
+        if rng.random() < 0.1:
+            known_domains.append('')
+        email_patterns = {domain: 'FirstName.LastName' for domain in known_domains}
+        confidence = {domain: rng.choice([0.2, 0.49, MIN_FALLBACK_CONFIDENCE, 0.8, 1.0])
+                      for domain in email_patterns if rng.random() < 0.5}
+        index = DomainIndex(email_patterns, confidence)
+        for domain in queries(rng, list(email_patterns)):
+            assert index.find(domain) == linear_scan(email_patterns, domain, confidence), domain
+
+
+def test_find_without_confidence_uses_every_domain():
+    email_patterns = {'acme.com': 'FirstName.LastName', 'mail.example.org': 'FirstLetterLastName'}
+    index = DomainIndex(email_patterns)
+    assert index.find('eu.acme.com') == 'acme.com'
+    assert index.find('example.org') == 'mail.example.org'
+    assert index.find('other.net') is None
+
+
+def test_low_confidence_domains_are_not_lent():
+    email_patterns = {'acme.com': 'FirstName.LastName', 'sub.acme.com': 'FirstLetterLastName'}
+    index = DomainIndex(email_patterns, {'acme.com': MIN_FALLBACK_CONFIDENCE / 2})
+    assert index.find('eu.acme.com') is None
+    assert index.find('acme') == 'sub.acme.com'
+    assert len(index) == 2
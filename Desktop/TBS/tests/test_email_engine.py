@@ -0,0 +1,131 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import email_engine
+from known_people import KnownPeople, person_keys
+from pattern_ranking import PatternRanking
+
+
+def test_predict_frame_empty_input():
+    header = io.StringIO("First Name,Last Name,Email Format,Domain\n")
+    for dtype in (None, 'category'):
+        header.seek(0)
+        df = pd.read_csv(header, dtype=dtype)
+        result = email_engine.predict_frame(df)
+        assert len(result) == 0
+        assert 'Email generated' in result.columns
+
+
+def test_predict_frame_empty_chunks():
+    df = pd.DataFrame(columns=email_engine.PREDICT_COLUMNS)
+    result = email_engine.run_chunked(df, email_engine.predict_frame, 10)
+    assert len(result) == 0
+
+
+def test_predict_frame_marks_failed_rows():
+    df = pd.DataFrame({
+        'First Name': ['John', 'Jane'],
+        'Last Name': ['Smith', None],
+        'Email Format': ['FirstName.LastName', 'FirstName.LastName'],
+        'Domain': ['acme.com', 'acme.com'],
+    })
+    result = email_engine.predict_frame(df)
+    assert list(result['Email generated']) == ['john.smith@acme.com', 'Error predicting email']
+
+
+@pytest.mark.parametrize('url, domain', [
+    ('acme.com', 'acme.com'),
+    ('HTTPS://WWW.Acme.com/about', 'acme.com'),
+    ('http://www.acme.com:8080', 'acme.com'),
+    ('https://acme.com/search?q=a.b@c.com', 'acme.com'),
+    ('acme.com?ref=1', 'acme.com'),
+    ('//cdn.acme.com#top', 'cdn.acme.com'),
+    ('http://user:pw@shop.acme.co.uk:8080/path', 'shop.acme.co.uk'),
+    ('mail.acme.com/', 'mail.acme.com'),
+    ('www2.acme.com', 'www2.acme.com'),
+    ('ftp://files.acme.org', 'files.acme.org'),
+    ('  acme.com.  ', 'acme.com'),
+])
+def test_clean_domain(url, domain):
+    assert email_engine.clean_domain(url) == domain
+
+
+def test_clean_domains_parses_each_url_once():
+    urls = pd.Series(['https://www.acme.com', 'acme.com', 'https://www.acme.com', 'HTTP://Foo.io/'])
+    assert email_engine.clean_domains(urls).tolist() == ['acme.com', 'acme.com', 'acme.com', 'foo.io']
+
+
+@pytest.mark.parametrize('name, normalized', [
+    ('John', 'john'),
+    ('  Ann ', 'ann'),
+    ('José', 'jose'),
+    ('Zoë', 'zoe'),
+    ('Ñoño', 'nono'),
+    ('Søren', 'soren'),
+    ('Łukasz', 'lukasz'),
+    ('Straße', 'strasse'),
+    ('Mary-Jane', 'mary-jane'),
+    ("O'Brien", 'obrien'),
+    ('Jean Luc', 'jeanluc'),
+])
+def test_normalize_name(name, normalized):
+    assert email_engine.normalize_name(name) == normalized
+
+
+def test_normalize_names_missing_and_empty():
+    names = pd.Series(['José', None, np.nan, "'", 'JOSÉ'], dtype=object)
+    assert email_engine.normalize_names(names).tolist()[::4] == ['jose', 'jose']
+    assert email_engine.normalize_names(names).iloc[1:4].isna().all()
+    if email_engine.unidecode is None:
+        # Without unidecode, non-Latin scripts have nothing left and become NaN
+        assert email_engine.normalize_names(pd.Series(['李'])).isna().all()
+    else:
+        assert email_engine.normalize_names(pd.Series(['李'])).tolist() == ['li']
+
+
+def leads():
+    return pd.DataFrame({
+        'First Name': ['John', 'Jane', 'Bob'],
+        'Last Name': ['Smith', 'Doe', 'Ray'],
+        'URL': ['https://acme.com', 'foo.io', 'acme.com'],
+    })
+
+
+def john_smith():
+    return KnownPeople([(person_keys('john', 'smith', 'acme.com'), 'jsmith@acme.com', 'FirstLetterLastName')])
+
+
+def test_candidates_frame_empty_ranking():
+    result = email_engine.candidates_frame(leads(), PatternRanking([]), k=3)
+    assert len(result) == 0
+    assert list(result.columns) == list(email_engine.CANDIDATE_EXPORT.values())
+
+
+def test_candidates_frame_known_people_with_empty_ranking():
+    result = email_engine.candidates_frame(leads(), PatternRanking([]), k=3, known_people=john_smith())
+    assert result.to_dict('records') == [{
+        'lead_id': 0, 'client': 'John Smith', 'domain': 'acme.com', 'rank': 1, 'email': 'jsmith@acme.com',
+        'pattern': 'FirstLetterLastName', 'score': 1.0, 'verified': True,
+    }]
+
+
+def test_candidates_frame_known_people_first_in_lead_order():
+    ranking = PatternRanking([('acme.com', 'FirstName.LastName', 3), ('foo.io', 'LastName', 1)])
+    result = email_engine.candidates_frame(leads(), ranking, k=2, known_people=john_smith())
+    assert result['lead_id'].tolist() == [0, 1, 1, 2, 2]
+    assert result['email'].tolist()[:2] == ['jsmith@acme.com', 'doe@foo.io']
+    assert result['verified'].tolist() == [True, False, False, False, False]
+    assert result['pattern'].tolist()[0] == 'FirstLetterLastName'
+
+
+def test_generate_frame_uses_known_emails():
+    email_patterns = {'acme.com': 'FirstName.LastName'}
+    result = email_engine.generate_frame(leads(), email_patterns, known_people=john_smith())
+    assert result['predicted_email'].tolist() == ['jsmith@acme.com', 'janed@foo.io', 'bob.ray@acme.com']
+    assert result['verified'].tolist() == [True, False, False]
+    # An empty index predicts every lead
+    result = email_engine.generate_frame(leads(), email_patterns, known_people=KnownPeople([]))
+    assert not result['verified'].any()
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from email_verify import (BAD_SYNTAX, CATCH_ALL, INVALID, NO_MAIL_SERVER, RCPT_PER_TRANSACTION, UNKNOWN, VALID,
+                          EmailVerifier, verify_frame)
+
+MAILBOXES = {'john.smith@example.com', 'ann.lee@example.com'}
+CATCH_ALL_DOMAIN = 'catchall.test'
+GREYLIST_DOMAIN = 'greylist.test'
+
+
+class StandInSMTP:
+    """Local SMTP server answering RCPT TO from MAILBOXES; counts sessions and probes"""
+
+    def __init__(self, refuse_after_reset=False):
+        self.refuse_after_reset = refuse_after_reset
+        self.connections = 0
+        self.quits = 0
+        self.open = 0
+        self.max_open = 0
+        self.rcpt_times = []
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self.handle, '127.0.0.1', 0), self.loop
+        ).result()
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def rcpt_reply(self, address):
+        domain = address.rpartition('@')[2]
+        if address in MAILBOXES or domain == CATCH_ALL_DOMAIN:
+            return b'250 OK\r\n'
+        if domain == GREYLIST_DOMAIN:
+            return b'451 4.7.1 try again later\r\n'
+        return b'550 5.1.1 no such user\r\n'
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.open += 1
+        self.max_open = max(self.max_open, self.open)
+        writer.write(b'220 stand-in ESMTP\r\n')
+        reset = False
+        try:
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                verb = line.upper()
+                if verb.startswith('EHLO'):
+                    writer.write(b'250-stand-in\r\n250 OK\r\n')
+                elif verb.startswith('RSET'):
+                    reset = True
+                    writer.write(b'250 OK\r\n')
+                elif verb.startswith('MAIL FROM'):
+                    writer.write(b'451 4.3.2 try again later\r\n' if reset and self.refuse_after_reset else b'250 OK\r\n')
+                elif verb.startswith('RCPT TO'):
+                    self.rcpt_times.append(time.monotonic())
+                    writer.write(self.rcpt_reply(line[line.index('<') + 1:line.index('>')].lower()))
+                elif verb.startswith('QUIT'):
+                    self.quits += 1
+                    writer.write(b'221 bye\r\n')
+                    await writer.drain()
+                    break
+                else:
+                    writer.write(b'502 unknown command\r\n')
+                await writer.drain()
+        finally:
+            self.open -= 1
+            writer.close()
+
+    def close(self):
+        async def stop():
+            self.server.close()
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+@pytest.fixture
+def smtp_server():
+    server = StandInSMTP()
+    yield server
+    server.close()
+
+
+def verifier_for(server, **kwargs):
+    mx_hosts = {domain: ['127.0.0.1'] for domain in ('example.com', CATCH_ALL_DOMAIN, GREYLIST_DOMAIN)}
+    mx_hosts['nomail.test'] = []
+    kwargs.setdefault('probes_per_second', 0)
+    return EmailVerifier(port=server.port, timeout=5, mx_hosts=mx_hosts, helo_host='localhost', **kwargs)
+
+
+def test_statuses(smtp_server):
+    emails = [
+        'john.smith@example.com',
+        'nobody@example.com',
+        'anyone@catchall.test',
+        'someone@greylist.test',
+        'someone@nomail.test',
+        'not an email',
+        None,
+    ]
+    with verifier_for(smtp_server) as verifier:
+        statuses = verifier.verify(emails)
+    assert statuses == [VALID, INVALID, CATCH_ALL, UNKNOWN, NO_MAIL_SERVER, BAD_SYNTAX, BAD_SYNTAX]
+
+
+def test_each_address_is_probed_once(smtp_server):
+    with verifier_for(smtp_server, check_catch_all=False) as verifier:
+        assert verifier.verify(['ann.lee@example.com'] * 5) == [VALID] * 5
+        assert verifier.verify(['ann.lee@example.com']) == [VALID]
+    assert len(smtp_server.rcpt_times) == 1
+
+
+def test_connections_are_pooled(smtp_server):
+    emails = [f"user{i}@example.com" for i in range(200)]
+    with verifier_for(smtp_server, connections_per_domain=3, check_catch_all=False) as verifier:
+        statuses = verifier.verify(emails)
+    assert statuses == [INVALID] * len(emails)
+    assert len(smtp_server.rcpt_times) == len(emails)
+    assert smtp_server.connections <= 3
+    assert smtp_server.max_open <= 3
+
+
+def test_refused_transaction_closes_the_connection():
+    server = StandInSMTP(refuse_after_reset=True)
+    try:
+        emails = [f"user{i}@example.com" for i in range(RCPT_PER_TRANSACTION + 10)]
+        with verifier_for(server, connections_per_domain=1, check_catch_all=False) as verifier:
+            statuses = verifier.verify(emails)
+        # The session refusing a new MAIL FROM is quit and the probe retried on a new one
+        assert statuses == [INVALID] * len(emails)
+        assert server.connections == 2
+        assert server.quits == server.connections
+    finally:
+        server.close()
+
+
+def test_rate_limit(smtp_server):
+    emails = [f"user{i}@example.com" for i in range(10)]
+    with verifier_for(smtp_server, probes_per_second=20, check_catch_all=False) as verifier:
+        verifier.verify(emails)
+    gaps = [b - a for a, b in zip(smtp_server.rcpt_times, smtp_server.rcpt_times[1:])]
+    # Probes start at least 1/20 s apart; allow for timer granularity
+    assert smtp_server.rcpt_times[-1] - smtp_server.rcpt_times[0] >= 9 / 20 - 0.05
+    assert min(gaps) >= 1 / 20 - 0.02
+
+
+def test_verify_frame(smtp_server):
+    df = pd.DataFrame({'email': ['john.smith@example.com', 'nobody@example.com', 'john.smith@example.com']})
+    with verifier_for(smtp_server) as verifier:
+        result = verify_frame(df, 'email', verifier)
+    assert list(result['verification']) == [VALID, INVALID, VALID]
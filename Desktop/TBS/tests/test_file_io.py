@@ -0,0 +1,52 @@
+import os
+
+import pandas as pd
+import pytest
+
+import file_io
+
+
+def write_cache_file(cache_dir, name, size, mtime):
+    path = os.path.join(cache_dir, name + '.feather')
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_cache_by_count_and_size(tmp_path):
+    paths = [write_cache_file(tmp_path, f"f{i}", 100, 1000 + i) for i in range(6)]
+    file_io.prune_cache(tmp_path, keep=4, max_bytes=10_000)
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True, True, True]
+
+    file_io.prune_cache(tmp_path, keep=4, max_bytes=250)
+    assert [os.path.exists(path) for path in paths] == [False, False, False, False, True, True]
+
+
+def test_csv_cache_is_opt_in(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'leads.csv'
+    pd.DataFrame({'a': ['x', 'y'], 'b': ['1', '2']}).to_csv(path, index=False)
+    cache_dir = tmp_path / 'cache'
+
+    file_io.read_columns(str(path), ['a'])
+    assert not cache_dir.exists()
+
+    first = file_io.read_columns(str(path), ['a'], cache_dir=str(cache_dir))
+    assert len(os.listdir(cache_dir)) == 1
+    again = file_io.read_columns(str(path), ['a'], cache_dir=str(cache_dir))
+    assert list(again['a']) == list(first['a']) == ['x', 'y']
+
+
+def test_csv_quoted_multiline_cells(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    # Small blocks so quoted cells straddle block boundaries
+    monkeypatch.setattr(file_io, 'CSV_BLOCK_SIZE', 64)
+    path = tmp_path / 'leads.csv'
+    names = [f"Person {i}" for i in range(50)]
+    notes = [f"line one\nline {i}" for i in range(50)]
+    pd.DataFrame({'Name': names, 'Notes': notes}).to_csv(path, index=False)
+
+    df = file_io.read_csv_progress(str(path), ['Name', 'Notes'], {})
+    assert list(df['Name']) == names
+    assert list(df['Notes']) == notes
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+import email_engine
+from pattern_store import PatternStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PatternStore(str(tmp_path / 'patterns.db'))
+    yield store
+    store.close()
+
+
+def counts(store):
+    return {(domain, pattern): count for domain, pattern, count in store.load_counts()}
+
+
+def test_reimport_increments_counts(store):
+    batch = [('acme.com', 'FirstName.LastName', 3, 0, 2), ('foo.io', 'FirstLetterLastName', 1, 3, 3)]
+    store.upsert_counts(batch)
+    store.upsert_counts(batch)
+    assert counts(store) == {('acme.com', 'FirstName.LastName'): 6, ('foo.io', 'FirstLetterLastName'): 2}
+    assert store.version() == 2
+
+
+def test_add_frame_counts_analyzed_rows(store):
+    df = pd.DataFrame({
+        'Email': ['john.smith@acme.com', 'ann.lee@acme.com', 'jdoe@foo.io'],
+        'First Name': ['John', 'Ann', 'Jane'],
+        'Last Name': ['Smith', 'Lee', 'Doe'],
+    })
+    analyzed = email_engine.analyze_frame(df)
+    store.add_frame(analyzed)
+    store.add_frame(analyzed)
+    assert counts(store) == {('acme.com', 'FirstName.LastName'): 4, ('foo.io', 'FirstLetterLastName'): 2}
+    assert len(store.load_known()) == 3
+
+
+def test_tie_goes_to_the_pattern_seen_last(store):
+    store.upsert_counts([('acme.com', 'FirstName.LastName', 2, 0, 1), ('acme.com', 'FirstLetterLastName', 2, 2, 3)])
+    assert store.load_patterns() == {'acme.com': 'FirstLetterLastName'}
+
+    # A later batch makes the other pattern the newer one at the same count
+    store.upsert_counts([('acme.com', 'FirstName.LastName', 1, 0, 0), ('acme.com', 'FirstLetterLastName', 1, 1, 1)])
+    assert store.load_patterns() == {'acme.com': 'FirstLetterLastName'}
+    store.upsert_counts([('acme.com', 'FirstName.LastName', 1, 0, 0)])
+    store.upsert_counts([('acme.com', 'FirstLetterLastName', 1, 0, 0)])
+    store.upsert_counts([('acme.com', 'FirstName.LastName', 1, 0, 0)])
+    assert counts(store) == {('acme.com', 'FirstName.LastName'): 5, ('acme.com', 'FirstLetterLastName'): 4}
+    assert store.load_patterns() == {'acme.com': 'FirstName.LastName'}
+
+
+def test_consensus_shifts_as_rows_are_added(store):
+    store.upsert_counts([('acme.com', 'FirstName.LastName', 3, 0, 2), ('foo.io', 'LastName', 1, 3, 3)])
+    assert store.load_consensus() == [('acme.com', 'FirstName.LastName', 3, 3, 1.0), ('foo.io', 'LastName', 1, 1, 1.0)]
+
+    store.upsert_counts([('acme.com', 'FirstLetterLastName', 4, 0, 3), ('bar.org', 'FirstName', 2, 4, 5)])
+    consensus = store.load_consensus()
+    # Domains stay in order of first appearance
+    assert [row[0] for row in consensus] == ['acme.com', 'foo.io', 'bar.org']
+    assert consensus[0] == ('acme.com', 'FirstLetterLastName', 4, 7, pytest.approx(4 / 7))
+    assert store.load_confidence()['acme.com'] == pytest.approx(4 / 7)
+
+    store.upsert_counts([('acme.com', 'FirstName.LastName', 2, 0, 1)])
+    assert store.load_consensus()[0] == ('acme.com', 'FirstName.LastName', 5, 9, pytest.approx(5 / 9))
+
+
+def test_known_emails_keep_the_latest(store):
+    store.upsert_counts([], [('john\x1fsmith\x1facme.com', 'john.smith@acme.com', 'FirstName.LastName')])
+    store.upsert_counts([], [('john\x1fsmith\x1facme.com', 'jsmith@acme.com', 'FirstLetterLastName')])
+    assert store.load_known() == [('john\x1fsmith\x1facme.com', 'jsmith@acme.com', 'FirstLetterLastName')]
+
+
+def test_read_only(tmp_path, store):
+    missing = PatternStore(str(tmp_path / 'missing.db'), read_only=True)
+    assert missing.version() == 0
+    assert missing.load_consensus() == [] and missing.load_known() == []
+
+    store.upsert_counts([('acme.com', 'LastName', 1, 0, 0)])
+    reader = PatternStore(store.path, read_only=True)
+    assert reader.load_patterns() == {'acme.com': 'LastName'}
+    with pytest.raises(PermissionError):
+        reader.upsert_counts([('acme.com', 'LastName', 1, 0, 0)])
+    reader.close()
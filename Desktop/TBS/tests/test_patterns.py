@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+from patterns import PATTERNS, shape_template, username_shape
+
+DETECT_CASES = [
+    # username, first name, last name, pattern
+    ('djoe', 'joe', 'smith', 'LastNameFirstLetterFirstName'),
+    ('ashleyj', 'ashley', 'jones', 'FirstNameFirstLetterLastName'),
+    # The {first}{f} alias
+    ('fernandof', 'fernando', 'garcia', 'FirstNameFirstLetterLastName'),
+    ('willcom', 'will', 'com', 'FirstNameLastName'),
+    ('jsmith', 'john', 'smith', 'FirstLetterLastName'),
+    ('john.smith', 'john', 'smith', 'FirstName.LastName'),
+    ('john_smith', 'john', 'smith', 'FirstName_LastName'),
+    ('smith', 'john', 'smith', 'LastName'),
+    ('john', 'john', 'smith', 'FirstName'),
+    ('john.s', 'john', 'smith', 'FirstName.FirstLetterLastName'),
+    ('j.smith', 'john', 'smith', 'FirstLetter.LastName'),
+    ('smith.john', 'john', 'smith', 'LastName.FirstName'),
+    ('smithjohn', 'john', 'smith', 'LastNameFirstName'),
+    ('smith_john', 'john', 'smith', 'LastName_FirstName'),
+    # Priority: d + first name wins over the last name it also equals
+    ('djoe', 'joe', 'djoe', 'LastNameFirstLetterFirstName'),
+    # A template needing the initial of an empty name marks the row invalid
+    ('smith', '', 'smith', 'invalid'),
+    ('john', 'john', '', 'invalid'),
+    (None, 'john', 'smith', 'invalid'),
+    # Nothing builds it
+    ('xyz', 'john', 'smith', None),
+]
+
+
+def test_username_shape():
+    assert username_shape('smith-john7', 'john', 'smith') == '\x02-\x019'
+    assert username_shape('john.q.smith', 'john', 'smith') == '\x01.a.\x02'
+    assert username_shape('js', 'john', 'smith') == '\x03\x04'
+    # Non-ASCII letters take the per-character path
+    assert username_shape('jöhn.smith', 'john', 'smith') == '\x03aaa.\x02'
+
+
+def test_infer():
+    username = pd.Series(['smith-john', 'john.q.smith2', 'bill.smith', 'smith'])
+    first_name = pd.Series(['john', 'john', 'william', 'john'])
+    last_name = pd.Series(['smith', 'smith', 'smith', 'smith'])
+    inferred = PATTERNS.infer(username, first_name, last_name)
+    assert list(inferred) == ['{last}-{first}', 'FirstName.LastName', None, 'LastName']
+
+
+@pytest.mark.parametrize('username, first_name, last_name, expected', DETECT_CASES)
+def test_detect(username, first_name, last_name, expected):
+    detected = PATTERNS.detect(pd.Series([username], dtype=object), pd.Series([first_name]), pd.Series([last_name]))
+    if expected is None:
+        assert pd.isna(detected.iloc[0])
+    else:
+        assert detected.iloc[0] == expected
+
+
+def test_detect_columns():
+    username, first_name, last_name, expected = (list(column) for column in zip(*DETECT_CASES))
+    detected = PATTERNS.detect(pd.Series(username, dtype=object), pd.Series(first_name), pd.Series(last_name))
+    assert [None if pd.isna(value) else value for value in detected] == expected
+
+
+@pytest.mark.parametrize('username, template', [
+    ('smith-john', '{last}-{first}'),
+    ('smith-john7', '{last}-{first}'),
+    ('john.q.smith', '{first}.{last}'),
+    ('john.q2.smith', '{first}.{last}'),
+    # A stray letter next to a field leaves the only separator in place
+    ('johnx.smith', '{first}.{last}'),
+    ('john.xsmith', '{first}.{last}'),
+    ('x.john.smith', '{first}.{last}'),
+    ('john.smith.2', '{first}.{last}'),
+    ('john2smith', '{first}{last}'),
+    ('jsmith_12', '{f}{last}'),
+    ('bill.smith', None),
+    ('js', None),
+])
+def test_shape_template(username, template):
+    assert shape_template(username_shape(username, 'john', 'smith')) == template
@@ -0,0 +1,105 @@
+import pandas as pd
+
+from virtual_preview import VirtualPreview
+
+
+class FakeTree:
+    """The parts of ttk.Treeview and Tk's after() the preview uses"""
+
+    def __init__(self, height=5):
+        self.height = height
+        self.items = {}
+        self.scheduled = {}
+
+    def cget(self, option):
+        return self.height
+
+    def bind(self, sequence, func):
+        pass
+
+    def get_children(self):
+        return list(self.items)
+
+    def item(self, item, values):
+        self.items[item] = values
+
+    def insert(self, parent, index, values):
+        item = f"I{len(self.items)}"
+        self.items[item] = values
+        return item
+
+    def delete(self, *items):
+        for item in items:
+            del self.items[item]
+
+    def after(self, delay, func, *args):
+        after_id = f"after#{len(self.scheduled)}"
+        self.scheduled[after_id] = (func, args)
+        return after_id
+
+    def after_cancel(self, after_id):
+        del self.scheduled[after_id]
+
+    def run_scheduled(self):
+        scheduled, self.scheduled = self.scheduled, {}
+        for func, args in scheduled.values():
+            func(*args)
+
+
+class FakeWidget:
+    def set(self, *args):
+        pass
+
+    def config(self, **options):
+        self.options = options
+
+
+def make_preview():
+    return VirtualPreview(FakeTree(), FakeWidget(), FakeWidget())
+
+
+def chunk(names, domains):
+    return pd.DataFrame({'client': names, 'domain': domains})
+
+
+def shown(preview):
+    return [values[0] for values in preview.tree.items.values()]
+
+
+def test_filter_matches_any_column_across_chunks():
+    preview = make_preview()
+    preview.append_frame(chunk(['Ann Lee', 'Bob Ray'], ['acme.com', 'bobco.io']), ['client', 'domain'])
+    preview.append_frame(chunk(['Cy Acme', 'Di Fox'], ['cy.org', 'fox.net']), ['client', 'domain'])
+    preview.set_filter('ACME')
+    assert shown(preview) == ['Ann Lee', 'Cy Acme']
+    # Narrowing searches only the current matches
+    preview.set_filter('acme.')
+    assert shown(preview) == ['Ann Lee']
+    preview.set_filter('')
+    assert len(shown(preview)) == 4
+
+
+def test_filter_never_matches_across_columns():
+    preview = make_preview()
+    preview.set_frame(chunk(['Ann'], ['lee.com']), ['client', 'domain'])
+    preview.set_filter('annlee')
+    assert shown(preview) == []
+
+
+def test_filter_later_applies_only_the_last_text():
+    preview = make_preview()
+    preview.set_frame(chunk(['Ann', 'Bob'], ['a.com', 'b.com']), ['client', 'domain'])
+    for text in ['b', 'bo', 'bob']:
+        preview.filter_later(text)
+    assert len(preview.tree.scheduled) == 1
+    preview.tree.run_scheduled()
+    assert preview.filter_text == 'bob'
+    assert shown(preview) == ['Bob']
+
+
+def test_filter_applies_to_rows_loaded_after_clear():
+    preview = make_preview()
+    preview.set_filter('bob')
+    preview.clear()
+    preview.append_frame(chunk(['Ann', 'Bob'], ['a.com', 'b.com']), ['client', 'domain'])
+    assert shown(preview) == ['Bob']
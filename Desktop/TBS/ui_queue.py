@@ -0,0 +1,60 @@
+import queue
+import threading
+
+from run_log import logger
+
+# Frames per second at which queued widget updates are applied
+DEFAULT_FPS = 20
+
+
+class UIEventQueue:
+    """Hands widget updates from worker threads to the Tk main loop.
+
+    Tk widgets may only be touched from the thread running mainloop. Worker
+    threads post callables here instead, and drain() applies them from the
+    main loop via after(), at most fps times a second.
+
+    post() delivers every event, in order (results, final status, errors).
+    post_latest() keeps only the newest event per key until the next frame,
+    so progress bars and status labels redraw at the frame rate no matter
+    how often a worker reports.
+    """
+
+    def __init__(self, root, fps=DEFAULT_FPS):
+        self.root = root
+        self.interval = max(1, int(1000 / fps))
+        self.events = queue.Queue()
+        self.latest = {}
+        self.lock = threading.Lock()
+
+    def post(self, func, *args, **kwargs):
+        self.events.put((func, args, kwargs))
+
+    def post_latest(self, key, func, *args, **kwargs):
+        with self.lock:
+            self.latest[key] = (func, args, kwargs)
+
+    def start(self):
+        self.root.after(self.interval, self.drain)
+
+    def drain(self):
+        # Throttled updates go first so a later final status is never overwritten
+        with self.lock:
+            latest, self.latest = self.latest, {}
+        for func, args, kwargs in latest.values():
+            self._apply(func, args, kwargs)
+
+        while True:
+            try:
+                func, args, kwargs = self.events.get_nowait()
+            except queue.Empty:
+                break
+            self._apply(func, args, kwargs)
+
+        self.root.after(self.interval, self.drain)
+
+    def _apply(self, func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Error applying UI update: {str(e)}")
@@ -0,0 +1,188 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+# Typing pause before the filter is applied, so each keystroke does not rescan every row
+FILTER_DELAY_MS = 250
+
+
+class VirtualPreview:
+    """Paged view of result frames in a fixed-size Treeview.
+
+    The Treeview only ever holds one screen of items. Scrolling rewrites
+    their values with rows fetched from the backing frames, so the cost of
+    showing a result does not depend on its size. Results can be appended
+    chunk by chunk; each chunk frame is kept as is rather than copied into
+    one big frame.
+
+    The filter stays in force across clear(), so rows loaded later are
+    filtered by the text still shown in the filter box.
+    """
+
+    def __init__(self, tree, scrollbar, counts_label):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.counts_label = counts_label
+        self.visible_rows = int(tree.cget('height'))
+
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.yview('scroll', -1, 'units'))
+        self.tree.bind('<Button-5>', lambda e: self.yview('scroll', 1, 'units'))
+        self.filter_text = ''
+        self.pending_filter = None  # after() id of a filter waiting for typing to pause
+        self.clear()
+
+    def clear(self):
+        self.frames = []  # result chunks, in order
+        self.starts = []  # first row number of each chunk
+        self.columns = []
+        self.total_rows = 0
+        self.search_text = []  # per chunk: lowercase preview columns joined, built on first filter
+        self.matches = []  # per chunk: matching row numbers, only while filtering
+        self.match_rows = np.array([], dtype=np.intp)  # self.matches concatenated
+        self.offset = 0
+        self.page = (0, 0, [])  # cached (first, last, rows) around the visible window
+        self.render()
+
+    def set_frame(self, df, columns):
+        self.clear()
+        self.append_frame(df, columns)
+
+    def append_frame(self, df, columns):
+        """Add a chunk of results below the existing ones"""
+        if len(df) == 0:
+            return
+        self.columns = columns
+        self.frames.append(df)
+        self.starts.append(self.total_rows)
+        self.search_text.append(None)
+        if self.filter_text:
+            self.matches.append(self._match_rows(len(self.frames) - 1))
+            self._join_matches()
+        self.total_rows += len(df)
+        self.page = (0, 0, [])
+        self.render()
+
+    def filter_later(self, text):
+        """set_filter(text) once typing pauses for FILTER_DELAY_MS"""
+        if self.pending_filter is not None:
+            self.tree.after_cancel(self.pending_filter)
+        self.pending_filter = self.tree.after(FILTER_DELAY_MS, self._apply_pending_filter, text)
+
+    def _apply_pending_filter(self, text):
+        self.pending_filter = None
+        self.set_filter(text)
+
+    def set_filter(self, text):
+        """Show only rows where any preview column contains text (case-insensitive)"""
+        previous = self.filter_text
+        self.filter_text = text.strip().lower()
+        if not self.filter_text:
+            self.matches = []
+        elif previous and previous in self.filter_text:
+            # Typing more only narrows the view, so only the current matches are searched
+            self.matches = [self._match_rows(block, rows) for block, rows in enumerate(self.matches)]
+        else:
+            self.matches = [self._match_rows(block) for block in range(len(self.frames))]
+        self._join_matches()
+        self.offset = 0
+        self.page = (0, 0, [])
+        self.render()
+
+    def _search_text(self, block):
+        """Lowercase text of a chunk's preview columns, one string per row, cached"""
+        if self.search_text[block] is None:
+            df = self.frames[block]
+            text = None
+            for column in self.columns:
+                values = df[column].astype(str).str.lower().to_numpy(dtype=object)
+                # Joined by a character no filter text contains, so a match never spans two columns
+                text = values if text is None else text + '\x1f' + values
+            self.search_text[block] = pd.Series(text, dtype=object)
+        return self.search_text[block]
+
+    def _match_rows(self, block, rows=None):
+        """Row numbers of a chunk matching the filter, from rows if given, else the whole chunk"""
+        search_text = self._search_text(block)
+        start = self.starts[block]
+        if rows is None:
+            mask = search_text.str.contains(self.filter_text, regex=False).to_numpy()
+            return np.flatnonzero(mask) + start
+        mask = search_text.iloc[rows - start].str.contains(self.filter_text, regex=False).to_numpy()
+        return rows[mask]
+
+    def _join_matches(self):
+        self.match_rows = np.concatenate(self.matches) if self.matches else np.array([], dtype=np.intp)
+
+    def _view_rows(self):
+        """Number of rows in the current (possibly filtered) view"""
+        if self.filter_text:
+            return len(self.match_rows)
+        return self.total_rows
+
+    def _row_numbers(self, first, last):
+        """Backing row numbers for view positions first..last-1"""
+        if not self.filter_text:
+            return range(first, last)
+        return self.match_rows[first:last]
+
+    def _fetch(self, first, last):
+        """Read view positions first..last-1 from the backing frames"""
+        rows = []
+        for row in self._row_numbers(first, last):
+            block = bisect.bisect_right(self.starts, row) - 1
+            df = self.frames[block]
+            rows.append(tuple(df[column].iloc[row - self.starts[block]] for column in self.columns))
+        return rows
+
+    def _visible(self, first, last):
+        page_first, page_last, rows = self.page
+        if first < page_first or last > page_last:
+            # Refill the page with one screen of buffer on either side
+            page_first = max(0, first - self.visible_rows)
+            page_last = min(self._view_rows(), last + self.visible_rows)
+            rows = self._fetch(page_first, page_last)
+            self.page = (page_first, page_last, rows)
+        return rows[first - page_first:last - page_first]
+
+    def render(self):
+        view_rows = self._view_rows()
+        self.offset = max(0, min(self.offset, view_rows - self.visible_rows))
+        last = min(view_rows, self.offset + self.visible_rows)
+        rows = self._visible(self.offset, last)
+
+        # Reuse the existing items; only their values change
+        items = self.tree.get_children()
+        for index, values in enumerate(rows):
+            if index < len(items):
+                self.tree.item(items[index], values=values)
+            else:
+                self.tree.insert('', 'end', values=values)
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+
+        if view_rows:
+            self.scrollbar.set(self.offset / view_rows, last / view_rows)
+        else:
+            self.scrollbar.set(0, 1)
+
+        text = f"Total rows: {self.total_rows}"
+        if self.filter_text:
+            text += f" | Matching filter: {view_rows}"
+        if rows:
+            text += f" | Showing {self.offset + 1}-{last}"
+        self.counts_label.config(text=text)
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * self._view_rows())
+        elif args[0] == 'scroll':
+            step = self.visible_rows if args[2] == 'pages' else 1
+            self.offset += int(args[1]) * step
+        self.render()
+
+    def _on_mousewheel(self, event):
+        self.yview('scroll', -1 if event.delta > 0 else 1, 'units')
+        return 'break'